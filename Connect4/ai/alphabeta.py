@@ -1,161 +1,217 @@
+import time
+
+from ai.context import SearchContext
 from ai.heuristic import compute_heuristic
+from ai.ordering import MoveOrdering, center_order, drop_mirrored, ordered_moves
+from ai.transposition import EXACT, LOWER, UPPER, position_key, table_move
 from constants import AI_PLAYER, HUMAN_PLAYER
-from gui.tree_visualizer import visualizer, TreeNode, start_visualization
-import time
 
-def alphabeta_decision(board, depth, visualize=True):
+def alphabeta_decision(board, depth, tracer=None, leaf_evaluator=None, tt=None,
+                       stop=None, first_move=None, workers=None, stats=None, ordering=None):
+    # ordering: an ai.ordering.MoveOrdering (or StaticOrdering) for the
+    # inner nodes; a fresh MoveOrdering by default
+
+    if workers is not None and workers > 1:
+        if stats is not None:
+            raise ValueError("the parallel search does not collect stats")
+        # Imported here: ai.parallel imports this module
+        from ai.parallel import parallel_alphabeta_decision
+        return parallel_alphabeta_decision(board, depth, workers, first_move, stop)
+
+    if tt is not None:
+        tt.new_search()
+    if ordering is None:
+        ordering = MoveOrdering(board.cols)
+    ctx = SearchContext(tt, leaf_evaluator, stop, tracer, stats, ordering)
+    if stats is not None:
+        started = time.perf_counter()
 
-    if visualize:
-        start_visualization()
-        visualizer.root = None
-    
     best_col = None
     best_score = float('-inf')
     alpha = float('-inf')
     beta = float('inf')
-    
-    valid_moves = board.get_valid_moves()
-    center = board.cols // 2
-    valid_moves.sort(key=lambda x: abs(x - center))
-    
+
+    # The root keeps the static order: ties go to the first move searched
+    valid_moves = ordered_moves(board, center_order(board.cols))
+    if first_move in valid_moves:
+        valid_moves.remove(first_move)
+        valid_moves.insert(0, first_move)
+    valid_moves = drop_mirrored(board, valid_moves)
+
     # Create root node
-    root_node = TreeNode(col="ROOT", score=None, depth=depth, 
-                        is_maximizing=True, alpha=alpha, beta=beta)
-    if visualize:
-        visualizer.root = root_node
-    
+    root_node = None
+    if tracer is not None:
+        root_node = tracer.begin(depth, alpha, beta)
+
     for col in valid_moves:
-        new_board = board.copy()
-        new_board.drop_piece(col, AI_PLAYER)
-        
+        board.drop_piece(col, AI_PLAYER)
+
         # Create child node
-        child_node = TreeNode(col=col, score=None, depth=depth-1, 
-                             is_maximizing=False, alpha=alpha, beta=beta)
-        root_node.add_child(child_node)
-        
-        score = alphabeta(new_board, depth - 1, alpha, beta, False, 
-                         child_node, visualize)
-        
-        child_node.score = score
-        
+        child_node = None
+        if root_node is not None:
+            child_node = tracer.child(root_node, col, depth - 1, False, alpha, beta)
+
+        score = alphabeta(board, depth - 1, alpha, beta, False, child_node, ctx)
+        board.undo_piece(col)
+
         if score > best_score:
             best_score = score
             best_col = col
         alpha = max(alpha, best_score)
-        
-        # Update alpha in child nodes
-        child_node.alpha = alpha
-    
-    root_node.score = best_score
-    
-    if visualize:
-        visualizer.update_display()
-        # Give time for final render
-        time.sleep(1)
-    
+
+        if child_node is not None:
+            tracer.close(child_node, score, alpha=alpha)
+
+    if root_node is not None:
+        tracer.end(root_node, best_score, best_col)
+    if stats is not None:
+        stats.add_table(tt)
+        stats.wall_time += time.perf_counter() - started
+
     return best_col
 
 
-def alphabeta(board, depth, alpha, beta, maximizing, parent_node=None, visualize=True):
+def alphabeta(board, depth, alpha, beta, maximizing, node=None, ctx=None):
+    # node is this position's tracer handle; None when nothing is traced
+    if ctx is None:
+        ctx = SearchContext()
+    ctx.visit()
+    stats = ctx.stats
+    if stats is not None:
+        stats.nodes_by_depth[depth] += 1
+
     # Check for terminal states
     if board.is_full():
+        if stats is not None:
+            stats.terminal_nodes += 1
         ai_fours = board.count_fours(AI_PLAYER)
         human_fours = board.count_fours(HUMAN_PLAYER)
-        score = (ai_fours - human_fours) * 10000
-        
-        if parent_node:
-            parent_node.score = score
-        return score
-    
+        return (ai_fours - human_fours) * 10000
+
     if depth == 0:
-        score = compute_heuristic(board)
-        if parent_node:
-            parent_node.score = score
-        return score
-    
-    valid_moves = board.get_valid_moves()
-    center = board.cols // 2
-    valid_moves.sort(key=lambda x: abs(x - center))
-    
+        if stats is not None:
+            return stats.evaluate(board)
+        return compute_heuristic(board)
+
+    if stats is not None:
+        started = time.perf_counter()
+
+    # Transposition table: cut off on a usable bound, else try its move first
+    tt = ctx.tt
+    key = None
+    tt_move = None
+    if tt is not None:
+        key = position_key(board, maximizing)
+        entry = tt.probe(key)
+        if entry is not None:
+            _, entry_depth, value, flag, move, _ = entry
+            if entry_depth >= depth and (flag == EXACT or
+                                         (flag == LOWER and value >= beta) or
+                                         (flag == UPPER and value <= alpha)):
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return value
+            tt_move = table_move(board, move)
+
+    ordering = ctx.ordering
+    if ordering is None:
+        ordering = ctx.ordering = MoveOrdering(board.cols)
+    player = AI_PLAYER if maximizing else HUMAN_PLAYER
+    valid_moves = ordering.order(board, depth, player, tt_move)
+    alpha_orig, beta_orig = alpha, beta
+    if stats is not None:
+        stats.movegen_time += time.perf_counter() - started
+
+    # Score all leaf children in one batch when an evaluator is given
+    leaf_scores = None
+    if depth == 1 and ctx.leaf_evaluator is not None:
+        if stats is not None:
+            leaf_scores = stats.evaluate_batch(ctx.leaf_evaluator, board, player, valid_moves)
+        else:
+            leaf_scores = ctx.leaf_evaluator(board, player, valid_moves)
+
+    tracer = ctx.tracer
     if maximizing:
         best = float('-inf')
+        best_move = None
         for i, col in enumerate(valid_moves):
-            new_board = board.copy()
-            new_board.drop_piece(col, AI_PLAYER)
-            
             # Create child node
             child_node = None
-            if parent_node and visualize:
-                child_node = TreeNode(col=col, score=None, depth=depth-1, 
-                                     is_maximizing=True, alpha=alpha, beta=beta)
-                parent_node.add_child(child_node)
-            
-            score = alphabeta(new_board, depth - 1, alpha, beta, False, 
-                            child_node, visualize)
-            
-            if child_node:
-                child_node.score = score
-            
-            best = max(best, score)
+            if node is not None:
+                child_node = tracer.child(node, col, depth - 1, True, alpha, beta)
+
+            if leaf_scores is not None:
+                score = leaf_scores[i]
+            else:
+                board.drop_piece(col, AI_PLAYER)
+                score = alphabeta(board, depth - 1, alpha, beta, False, child_node, ctx)
+                board.undo_piece(col)
+
+            if score > best:
+                best = score
+                best_move = col
             alpha = max(alpha, best)
-            
-            # Update alpha in child node
-            if child_node:
-                child_node.alpha = alpha
-            
+
+            if child_node is not None:
+                tracer.close(child_node, score, alpha=alpha)
+
             # Check for pruning
             if beta <= alpha:
+                ordering.cutoff(depth, player, col)
+                if stats is not None:
+                    stats.cutoff(i)
                 # Mark remaining moves as pruned
-                if parent_node and visualize:
-                    for remaining_col in valid_moves[i + 1:]:
-                        pruned_node = TreeNode(col=remaining_col, score="pruned", 
-                                              depth=depth-1, is_maximizing=True, 
-                                              alpha=alpha, beta=beta)
-                        pruned_node.pruned = True
-                        parent_node.add_child(pruned_node)
+                if node is not None:
+                    tracer.pruned(node, valid_moves[i + 1:], depth - 1, True, alpha, beta)
                 break
-        
-        if parent_node:
-            parent_node.score = best
+
+        _store(tt, key, depth, best, alpha_orig, beta_orig, table_move(board, best_move))
         return best
     else:
         best = float('inf')
+        best_move = None
         for i, col in enumerate(valid_moves):
-            new_board = board.copy()
-            new_board.drop_piece(col, HUMAN_PLAYER)
-            
             # Create child node
             child_node = None
-            if parent_node and visualize:
-                child_node = TreeNode(col=col, score=None, depth=depth-1, 
-                                     is_maximizing=False, alpha=alpha, beta=beta)
-                parent_node.add_child(child_node)
-            
-            score = alphabeta(new_board, depth - 1, alpha, beta, True, 
-                            child_node, visualize)
-            
-            if child_node:
-                child_node.score = score
-            
-            best = min(best, score)
+            if node is not None:
+                child_node = tracer.child(node, col, depth - 1, False, alpha, beta)
+
+            if leaf_scores is not None:
+                score = leaf_scores[i]
+            else:
+                board.drop_piece(col, HUMAN_PLAYER)
+                score = alphabeta(board, depth - 1, alpha, beta, True, child_node, ctx)
+                board.undo_piece(col)
+
+            if score < best:
+                best = score
+                best_move = col
             beta = min(beta, best)
-            
-            # Update beta in child node
-            if child_node:
-                child_node.beta = beta
-            
+
+            if child_node is not None:
+                tracer.close(child_node, score, beta=beta)
+
             # Check for pruning
             if beta <= alpha:
+                ordering.cutoff(depth, player, col)
+                if stats is not None:
+                    stats.cutoff(i)
                 # Mark remaining moves as pruned
-                if parent_node and visualize:
-                    for remaining_col in valid_moves[i + 1:]:
-                        pruned_node = TreeNode(col=remaining_col, score="pruned", 
-                                              depth=depth-1, is_maximizing=False, 
-                                              alpha=alpha, beta=beta)
-                        pruned_node.pruned = True
-                        parent_node.add_child(pruned_node)
+                if node is not None:
+                    tracer.pruned(node, valid_moves[i + 1:], depth - 1, False, alpha, beta)
                 break
-        
-        if parent_node:
-            parent_node.score = best
-        return best
\ No newline at end of file
+
+        _store(tt, key, depth, best, alpha_orig, beta_orig, table_move(board, best_move))
+        return best
+
+
+def _store(tt, key, depth, value, alpha, beta, move):
+    if tt is None:
+        return
+    if value <= alpha:
+        flag = UPPER
+    elif value >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    tt.store(key, depth, value, flag, move)
@@ -0,0 +1,197 @@
+"""Opening book: alpha-beta moves precomputed for the first plies.
+
+    python -m ai.book --sizes 6x7 7x7 --plies 4 --depth 8 --processes 4
+
+Every position with up to ``--plies`` pieces in which the AI is to move
+(after either side opened) is searched once with ``alphabeta_decision`` at
+``--depth``, and the move is written to ``opening_books/<rows>x<cols>.book``.
+A position and its mirror image have mirrored best moves, so only one of
+each pair is searched and stored, under ``Board.canonical_key``.
+
+The file is a header followed by the sorted 64-bit position hashes and
+then one byte per position for its move.  ``OpeningBook`` memory-maps it
+and binary-searches the hashes, so a book costs nothing until it is read.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ai.alphabeta import alphabeta_decision
+from ai.pvs import pvs_decision
+from ai.transposition import TranspositionTable
+from board import Board
+from constants import AI_PLAYER, HUMAN_PLAYER, BOOK_DIR
+
+MAGIC = b"C4BK"
+VERSION = 1
+# magic, version, rows, cols, depth, plies, positions
+HEADER = struct.Struct("<4sHBBBBI")
+KEY = struct.Struct("<Q")
+
+# Engines that pick the book's move at the book's depth (PVS returns
+# alpha-beta's move); other engines search for themselves
+BOOK_ENGINES = (alphabeta_decision, pvs_decision)
+
+# Table size for each book search; the opening searches need little
+BOOK_TABLE_MB = 8
+
+
+def book_path(rows, cols, directory=BOOK_DIR):
+    return os.path.join(directory, f"{rows}x{cols}.book")
+
+
+class OpeningBook:
+    """A memory-mapped book file; ``lookup`` gives the move for a board."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.depth, self.plies, self.size = \
+            HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.moves_offset = HEADER.size + KEY.size * self.size
+
+    def __len__(self):
+        return self.size
+
+    def _key(self, index):
+        return KEY.unpack_from(self.data, HEADER.size + KEY.size * index)[0]
+
+    def _find(self, key):
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.size and self._key(low) == key:
+            return self.data[self.moves_offset + low]
+        return None
+
+    def lookup(self, board):
+        """The book move for ``board`` with the AI to move, or None."""
+        if (board.rows, board.cols) != (self.rows, self.cols):
+            return None
+        if sum(board.heights) > self.plies:
+            return None
+        move = self._find(board.canonical_key)
+        if move is None or not board.is_mirrored():
+            return move
+        return board.mirror_column(move)
+
+    def close(self):
+        self.data.close()
+
+
+def open_book(rows, cols, directory=BOOK_DIR):
+    """The book for this board size, or None when none has been built."""
+    path = book_path(rows, cols, directory)
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def book_positions(rows, cols, plies):
+    """Canonical ``key -> Board`` for every position with up to ``plies``
+    pieces in which the AI is to move, whichever side opened."""
+    positions = {}
+    for first in (HUMAN_PLAYER, AI_PLAYER):
+        empty = Board(rows, cols)
+        frontier = {empty.canonical_key: empty}
+        player = first
+        for ply in range(plies + 1):
+            if player == AI_PLAYER:
+                positions.update(frontier)
+            if ply == plies:
+                break
+            following = {}
+            for board in frontier.values():
+                for col in board.get_valid_moves():
+                    child = board.copy()
+                    child.drop_piece(col, player)
+                    key = child.canonical_key
+                    if key not in following:
+                        following[key] = child
+            frontier = following
+            player = AI_PLAYER if player == HUMAN_PLAYER else HUMAN_PLAYER
+    return positions
+
+
+def _search(state, depth, mirrored):
+    # A fresh table per position: entries left by other positions' searches
+    # can change the move, and the book should hold what a search plays
+    board = Board.unpack(state)
+    if mirrored:
+        board = board.mirror()
+    return alphabeta_decision(board, depth, tt=TranspositionTable(BOOK_TABLE_MB))
+
+
+def build_book(rows, cols, plies, depth, path, processes=None, on_progress=None):
+    """Search every book position and write the book to ``path``.
+
+    Returns the number of positions.  ``on_progress(done, total)`` is called
+    as the searches finish.
+    """
+    positions = book_positions(rows, cols, plies)
+    keys = sorted(positions)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # Each position is searched in its canonical orientation
+        jobs = [pool.submit(_search, positions[key].pack(), depth,
+                            positions[key].is_mirrored())
+                for key in keys]
+        moves = bytearray()
+        for done, job in enumerate(jobs, 1):
+            moves.append(job.result())
+            if on_progress is not None:
+                on_progress(done, len(jobs))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, depth, plies, len(keys)))
+        for key in keys:
+            f.write(KEY.pack(key))
+        f.write(moves)
+    return len(keys)
+
+
+def _size(text):
+    rows, _, cols = text.partition("x")
+    if not (rows.isdigit() and cols.isdigit()):
+        raise argparse.ArgumentTypeError(f"bad size {text!r} (use ROWSxCOLS, e.g. 6x7)")
+    return int(rows), int(cols)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build Connect 4 opening books.")
+    parser.add_argument("--sizes", type=_size, nargs="+", default=[(6, 7), (7, 7)],
+                        help="board sizes as ROWSxCOLS (default: 6x7 7x7)")
+    parser.add_argument("--plies", type=int, default=4,
+                        help="pieces on the board in the deepest book position (default: 4)")
+    parser.add_argument("--depth", type=int, default=8, help="search depth (default: 8)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dir", default=BOOK_DIR, help=f"output directory (default: {BOOK_DIR})")
+    args = parser.parse_args(argv)
+
+    for rows, cols in args.sizes:
+        path = book_path(rows, cols, args.dir)
+        start = time.perf_counter()
+
+        def progress(done, total):
+            print(f"\r{rows}x{cols}: {done}/{total}", end="", file=sys.stderr)
+
+        count = build_book(rows, cols, args.plies, args.depth, path, args.processes, progress)
+        print(f"\r{rows}x{cols}: {count} positions in {time.perf_counter() - start:.1f}s "
+              f"-> {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import time
+
+
+class SearchAborted(Exception):
+    """Raised from inside a search when its stop condition fires.
+
+    The board being searched is left with the moves of the interrupted line
+    still on it, so searches that may be stopped should run on a copy.
+    """
+
+
+class SearchContext:
+    """State shared by every node of one search.
+
+    tt: optional TranspositionTable
+    leaf_evaluator: optional batch scorer for the children of depth-1 nodes
+    stop: optional callable, polled at every node; True aborts the search
+    tracer: optional ai.tracer.Tracer receiving the searched nodes
+    stats: optional ai.stats.SearchStats counting what the search does
+    ordering: optional ai.ordering.MoveOrdering; alpha-beta makes one if unset
+    """
+
+    def __init__(self, tt=None, leaf_evaluator=None, stop=None, tracer=None, stats=None,
+                 ordering=None):
+        self.tt = tt
+        self.leaf_evaluator = leaf_evaluator
+        self.stop = stop
+        self.tracer = tracer
+        self.stats = stats
+        self.ordering = ordering
+        self.nodes = 0
+
+    def visit(self):
+        self.nodes += 1
+        if self.stop is not None and self.stop():
+            raise SearchAborted()
+
+
+class SearchProgress:
+    """Stop callable that also tracks how a running search is doing.
+
+    Given as ``stop`` it is polled once per node, so ``nodes`` counts the
+    nodes searched in this process (not those of parallel workers).
+    ``iteration_done`` is meant as iterative deepening's ``on_iteration``.
+    A move from the endgame solver is reported by ``endgame_done`` instead:
+    ``solved`` is then the number of empty cells solved and ``depth`` is
+    left alone, as the solve has no search depth.
+    ``request_stop`` may be called from another thread; the search then
+    ends at its next node.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.depth = 0
+        self.solved = None
+        self.move = None
+        self.started = time.perf_counter()
+        self.stopped = False
+
+    def __call__(self):
+        self.nodes += 1
+        return self.stopped
+
+    def request_stop(self):
+        self.stopped = True
+
+    def iteration_done(self, depth, move):
+        self.depth = depth
+        self.move = move
+
+    def endgame_done(self, empty, move):
+        self.solved = empty
+        self.move = move
+
+    def nodes_per_second(self):
+        elapsed = time.perf_counter() - self.started
+        return self.nodes / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,174 @@
+"""Exact endgame solver for near-full boards.
+
+The game ends when the board is full and is won on the four counts, so
+once few cells are empty the rest of the tree can be searched to the end.
+``EndgameSolver`` does that with alpha-beta on the final four-count
+difference (AI minus human; the heuristic only orders the moves) and
+remembers the bounds it proves for every position.  One solver is meant to last a whole
+game: after the first solve the following moves are mostly answered from
+memory.
+
+``endgame_threshold`` gives the number of empty cells from which solving
+pays off for a board size.
+"""
+from ai.context import SearchContext
+from ai.ordering import center_order, drop_mirrored, ordered_moves
+from ai.transposition import position_key, table_move
+from constants import AI_PLAYER, HUMAN_PLAYER
+
+INF = float('inf')
+
+# Nodes with more empty cells than this order their moves by the heuristic
+# score after them; below it the ordering costs more than it saves
+ORDER_CELLS = 4
+
+# Empty cells from which a 7-column board is solved: about where a whole
+# endgame of solving costs less than depth-8 alpha-beta searches
+ENDGAME_CELLS = 12
+
+
+def endgame_threshold(rows, cols):
+    """Empty cells at or below which a ``rows`` x ``cols`` board is solved.
+
+    Fewer columns branch less, so narrow boards are solved from more empty
+    cells and wide ones from fewer: ``ENDGAME_CELLS`` for 5-9 columns, one
+    more for every full three columns fewer than 7 (2-4 columns: 13) and
+    one fewer for every full three more (10-12 columns: 11), never more
+    than the board holds.
+    """
+    return min(rows * cols, ENDGAME_CELLS - int((cols - 7) / 3))
+
+
+def empty_cells(board):
+    return board.rows * board.cols - sum(board.heights)
+
+
+class EndgameSolver:
+    """Exact alpha-beta to the end of the game, memoized across searches.
+
+    ``memo`` maps a position key (``ai.transposition.position_key``) to the
+    ``(lower, upper)`` bounds proved for its final four-count difference
+    and the best move found there, tried first when it is searched again.
+    Positions not yet searched are bounded by the lines still open to each
+    player.
+    """
+
+    def __init__(self):
+        self.memo = {}
+
+    def best_move(self, board, stop=None):
+        """The AI's move that maximizes the final four-count difference.
+
+        Ties go to the centre-most column, as in the engines.  ``stop`` is
+        polled at every node like the engines' own, and a stopped solve
+        raises ``SearchAborted`` with pieces left on ``board``.
+        """
+        ctx = SearchContext(stop=stop)
+        empty = empty_cells(board)
+        best_col = None
+        best = -INF
+        for col in drop_mirrored(board, ordered_moves(board, center_order(board.cols))):
+            board.drop_piece(col, AI_PLAYER)
+            # A move no better than the best so far only needs to be bounded
+            value = self._solve(board, empty - 1, best, INF, False, ctx)
+            board.undo_piece(col)
+            if value > best:
+                best = value
+                best_col = col
+        # Each improvement was searched with an open upper bound, so the best
+        # value is exact; ``value`` on this board is then a lookup
+        if best_col is not None:
+            self.memo[position_key(board, True)] = (best, best, table_move(board, best_col))
+        return best_col
+
+    def value(self, board, maximizing=True, stop=None):
+        """Final four-count difference under perfect play, with the AI to
+        move when ``maximizing``."""
+        return self._solve(board, empty_cells(board), -INF, INF, maximizing,
+                           SearchContext(stop=stop))
+
+    def _solve(self, board, empty, alpha, beta, maximizing, ctx):
+        ctx.visit()
+        if empty == 0:
+            return board.ai_fours - board.human_fours
+
+        key = position_key(board, maximizing)
+        lower, upper, move = self.memo.get(key, (-INF, INF, None))
+        if lower == -INF and empty > ORDER_CELLS:
+            lower, upper = _reachable(board)
+        if lower >= beta:
+            return lower
+        if upper <= alpha or lower == upper:
+            return upper
+        alpha, beta = max(alpha, lower), min(beta, upper)
+        alpha_orig, beta_orig = alpha, beta
+
+        move = table_move(board, move)
+        if empty > ORDER_CELLS:
+            moves = _ordered(board, maximizing, move)
+        else:
+            moves = ordered_moves(board, center_order(board.cols))
+            if move is not None and moves[0] != move:
+                moves.remove(move)
+                moves.insert(0, move)
+        if maximizing:
+            best = -INF
+            for col in moves:
+                board.drop_piece(col, AI_PLAYER)
+                value = self._solve(board, empty - 1, alpha, beta, False, ctx)
+                board.undo_piece(col)
+                if value > best:
+                    best = value
+                    move = col
+                alpha = max(alpha, best)
+                if alpha >= beta:
+                    break
+        else:
+            best = INF
+            for col in moves:
+                board.drop_piece(col, HUMAN_PLAYER)
+                value = self._solve(board, empty - 1, alpha, beta, True, ctx)
+                board.undo_piece(col)
+                if value < best:
+                    best = value
+                    move = col
+                beta = min(beta, best)
+                if alpha >= beta:
+                    break
+
+        # A result outside the window only bounds the true value
+        if best <= alpha_orig:
+            upper = best
+        elif best >= beta_orig:
+            lower = best
+        else:
+            lower = upper = best
+        self.memo[key] = (lower, upper, table_move(board, move))
+        return best
+
+
+def _ordered(board, maximizing, first):
+    # The remembered best move, then the replies the heuristic likes best
+    player = AI_PLAYER if maximizing else HUMAN_PLAYER
+    scored = []
+    for col in ordered_moves(board, center_order(board.cols)):
+        board.drop_piece(col, player)
+        scored.append((col != first, -board.heuristic_score * player, col))
+        board.undo_piece(col)
+    scored.sort()
+    return [col for _, _, col in scored]
+
+
+def _reachable(board):
+    """Bounds on the final difference: every line still open to a player
+    may yet become one of its fours."""
+    ai_bits, human_bits = board.ai_bits, board.human_bits
+    ai_open = human_open = 0
+    for mask in board.geometry.window_masks:
+        if not human_bits & mask:
+            if ai_bits & mask != mask:
+                ai_open += 1
+        elif not ai_bits & mask and human_bits & mask != mask:
+            human_open += 1
+    diff = board.ai_fours - board.human_fours
+    return diff - human_open, diff + ai_open
@@ -33,34 +33,23 @@ def evaluate_window(window):
     return 0
 
 
+# WINDOW_SCORES[ai][human] is evaluate_window() for a window holding that
+# many AI and human pieces, so boards can score windows from bit counts.
+WINDOW_SCORES = [
+    [evaluate_window([AI_PLAYER] * ai + [HUMAN_PLAYER] * human + [EMPTY] * (4 - ai - human))
+     if ai + human <= 4 else 0 for human in range(5)]
+    for ai in range(5)
+]
+
+
 def compute_heuristic(board):
+    # Board keeps this score up to date on every drop/undo
+    return board.heuristic_score
+
 
+def scan_heuristic(board):
+    grid = board.grid
     score = 0
-    rows, cols, grid = board.rows, board.cols, board.grid
-    
-    
-    # horizontal
-    for row in range(rows):
-        for col in range(cols - 3):
-            window = [grid[row][col + i] for i in range(4)]
-            score += evaluate_window(window)
-    
-    # vertical
-    for row in range(rows - 3):
-        for col in range(cols):
-            window = [grid[row + i][col] for i in range(4)]
-            score += evaluate_window(window)
-    
-    # diagonal /
-    for row in range(3, rows):
-        for col in range(cols - 3):
-            window = [grid[row - i][col + i] for i in range(4)]
-            score += evaluate_window(window)
-    
-    # diagonal \
-    for row in range(rows - 3):
-        for col in range(cols - 3):
-            window = [grid[row + i][col + i] for i in range(4)]
-            score += evaluate_window(window)
-    
-    return score
\ No newline at end of file
+    for cells in board.geometry.grid_windows:
+        score += evaluate_window([grid[row][col] for row, col in cells])
+    return score
@@ -0,0 +1,56 @@
+import time
+
+from ai.alphabeta import alphabeta_decision
+from ai.context import SearchAborted
+from ai.ordering import center_order, ordered_moves
+from ai.transposition import TranspositionTable
+
+
+def iterative_deepening_decision(board, time_budget_ms, tt=None, decision=alphabeta_decision,
+                                 max_depth=None, workers=None, tracer=None, stop=None,
+                                 on_iteration=None, stats=None):
+    """Search depth 1, 2, ... until ``time_budget_ms`` runs out.
+
+    Returns the move of the deepest iteration that finished.  Each iteration
+    searches the previous best move first and shares the transposition table,
+    so earlier iterations order the moves of later ones.  ``decision`` may be
+    any of the engine decision functions.  A ``tracer`` sees every iteration
+    that finishes, and a ``stats`` (ai.stats.SearchStats) adds up all of them.
+
+    ``time_budget_ms`` may be None to search up to ``max_depth`` unless
+    ``stop`` (polled at every node, like the engines' own) ends it first.
+    ``on_iteration(depth, col)`` is called after each finished iteration.
+    """
+    deadline = None
+    if time_budget_ms is not None:
+        deadline = time.perf_counter() + time_budget_ms / 1000
+
+    def out_of_time():
+        if stop is not None and stop():
+            return True
+        return deadline is not None and time.perf_counter() > deadline
+
+    if tt is None:
+        tt = TranspositionTable()
+    if max_depth is None:
+        max_depth = board.rows * board.cols - sum(board.heights)
+
+    valid_moves = ordered_moves(board, center_order(board.cols))
+    if not valid_moves:
+        return None
+    best_col = valid_moves[0]
+
+    for depth in range(1, max_depth + 1):
+        try:
+            # The stopped search leaves pieces behind, so it runs on a copy
+            best_col = decision(board.copy(), depth, tracer=tracer, tt=tt,
+                                stop=out_of_time, first_move=best_col, workers=workers,
+                                stats=stats)
+        except SearchAborted:
+            break
+        if on_iteration is not None:
+            on_iteration(depth, best_col)
+        if out_of_time():
+            break
+
+    return best_col
@@ -1,123 +1,162 @@
+import time
+
+from ai.context import SearchContext
 from ai.heuristic import compute_heuristic
+from ai.ordering import drop_mirrored
+from ai.transposition import EXACT, position_key
 from constants import AI_PLAYER, HUMAN_PLAYER
-from gui.tree_visualizer import visualizer, TreeNode, start_visualization
-import time
 
-def minimax_decision(board, depth, visualize=True):
+def minimax_decision(board, depth, tracer=None, leaf_evaluator=None, tt=None,
+                     stop=None, first_move=None, workers=None, stats=None):
+
+    if workers is not None and workers > 1:
+        if stats is not None:
+            raise ValueError("the parallel search does not collect stats")
+        # Imported here: ai.parallel imports this module
+        from ai.parallel import parallel_minimax_decision
+        return parallel_minimax_decision(board, depth, workers, first_move, stop)
 
-    if visualize:
-        start_visualization()
-        visualizer.root = None
+    if tt is not None:
+        tt.new_search()
+    ctx = SearchContext(tt, leaf_evaluator, stop, tracer, stats)
+    if stats is not None:
+        started = time.perf_counter()
 
-    
     best_col = None
     best_score = float('-inf')
-    
+
     # Create root node
-    root_node = TreeNode(col="ROOT", score=None, depth=depth, 
-                        is_maximizing=True, alpha=None, beta=None)
-    if visualize:
-        visualizer.root = root_node
-    
+    root_node = None
+    if tracer is not None:
+        root_node = tracer.begin(depth)
+
     valid_moves = board.get_valid_moves()
+    if first_move in valid_moves:
+        valid_moves.remove(first_move)
+        valid_moves.insert(0, first_move)
+    valid_moves = drop_mirrored(board, valid_moves)
 
-    
     for col in valid_moves:
-        new_board = board.copy()
-        new_board.drop_piece(col, AI_PLAYER)
-        
+        board.drop_piece(col, AI_PLAYER)
+
         # Create child node for this move
         child_node = None
-        if visualize:
-            child_node = TreeNode(col=f"Col {col}", score=None, depth=depth-1,
-                                 is_maximizing=False, alpha=None, beta=None)
-            root_node.add_child(child_node)
-        
-        score = minimax(new_board, depth - 1, False, child_node, visualize)
-        
-        if child_node:
-            child_node.score = score
-        
-        
+        if root_node is not None:
+            child_node = tracer.child(root_node, col, depth - 1, False)
+
+        score = minimax(board, depth - 1, False, child_node, ctx)
+        board.undo_piece(col)
+
+        if child_node is not None:
+            tracer.close(child_node, score)
+
+
         if score > best_score:
             best_score = score
             best_col = col
-    
-    root_node.score = best_score
-    
-    
-    if visualize:
-        visualizer.update_display()
-        time.sleep(1)
-    
+
+    if root_node is not None:
+        tracer.end(root_node, best_score, best_col)
+    if stats is not None:
+        stats.add_table(tt)
+        stats.wall_time += time.perf_counter() - started
+
     return best_col
 
 
-def minimax(board, depth, maximizing_player, parent_node=None, visualize=True):
+def minimax(board, depth, maximizing_player, node=None, ctx=None):
+    # node is this position's tracer handle; None when nothing is traced
+    if ctx is None:
+        ctx = SearchContext()
+    ctx.visit()
+    stats = ctx.stats
+    if stats is not None:
+        stats.nodes_by_depth[depth] += 1
 
     # Check terminal states
     if board.is_full():
+        if stats is not None:
+            stats.terminal_nodes += 1
         ai_fours = board.count_fours(AI_PLAYER)
         human_fours = board.count_fours(HUMAN_PLAYER)
-        value = (ai_fours - human_fours) * 10000
-        
-        if parent_node:
-            parent_node.score = value
-        return value
+        return (ai_fours - human_fours) * 10000
 
     if depth == 0:
-        value = compute_heuristic(board)
-        if parent_node:
-            parent_node.score = value
-        return value
+        if stats is not None:
+            return stats.evaluate(board)
+        return compute_heuristic(board)
 
+    tt = ctx.tt
+    key = None
+    if tt is not None:
+        key = position_key(board, maximizing_player)
+        entry = tt.probe(key)
+        if entry is not None and entry[1] >= depth:
+            if stats is not None:
+                stats.tt_cutoffs += 1
+            return entry[2]
+
+    if stats is not None:
+        started = time.perf_counter()
     valid_moves = board.get_valid_moves()
+    if stats is not None:
+        stats.movegen_time += time.perf_counter() - started
+
+    # Score all leaf children in one batch when an evaluator is given
+    leaf_scores = None
+    if depth == 1 and ctx.leaf_evaluator is not None:
+        player = AI_PLAYER if maximizing_player else HUMAN_PLAYER
+        if stats is not None:
+            leaf_scores = stats.evaluate_batch(ctx.leaf_evaluator, board, player, valid_moves)
+        else:
+            leaf_scores = ctx.leaf_evaluator(board, player, valid_moves)
 
+    tracer = ctx.tracer
     if maximizing_player:
         best = float('-inf')
-        
-        for col in valid_moves:
-            new_board = board.copy()
-            new_board.drop_piece(col, AI_PLAYER)
-            
+
+        for i, col in enumerate(valid_moves):
             # Create child node
             child_node = None
-            if parent_node and visualize:
-                child_node = TreeNode(col=f"Col {col}", score=None, depth=depth-1,
-                                     is_maximizing=True, alpha=None, beta=None)
-                parent_node.add_child(child_node)
-            
-            val = minimax(new_board, depth - 1, False, child_node, visualize)
-            
-            if child_node:
-                child_node.score = val
-            
+            if node is not None:
+                child_node = tracer.child(node, col, depth - 1, True)
+
+            if leaf_scores is not None:
+                val = leaf_scores[i]
+            else:
+                board.drop_piece(col, AI_PLAYER)
+                val = minimax(board, depth - 1, False, child_node, ctx)
+                board.undo_piece(col)
+
+            if child_node is not None:
+                tracer.close(child_node, val)
+
             best = max(best, val)
-        
-        if parent_node:
-            parent_node.score = best
+
+        if tt is not None:
+            tt.store(key, depth, best, EXACT)
         return best
     else:
         best = float('inf')
-        
-        for col in valid_moves:
-            new_board = board.copy()
-            new_board.drop_piece(col, HUMAN_PLAYER)
-            
+
+        for i, col in enumerate(valid_moves):
             # Create child node
             child_node = None
-            if parent_node and visualize:
-                child_node = TreeNode(col=f"Col {col}", score=None, depth=depth-1,
-                                     is_maximizing=False, alpha=None, beta=None)
-                parent_node.add_child(child_node)
-            
-            val = minimax(new_board, depth - 1, True, child_node, visualize)
-            
-            if child_node:
-                child_node.score = val
-            
+            if node is not None:
+                child_node = tracer.child(node, col, depth - 1, False)
+
+            if leaf_scores is not None:
+                val = leaf_scores[i]
+            else:
+                board.drop_piece(col, HUMAN_PLAYER)
+                val = minimax(board, depth - 1, True, child_node, ctx)
+                board.undo_piece(col)
+
+            if child_node is not None:
+                tracer.close(child_node, val)
+
             best = min(best, val)
-        
-        if parent_node:
-            parent_node.score = best
-        return best
\ No newline at end of file
+
+        if tt is not None:
+            tt.store(key, depth, best, EXACT)
+        return best
@@ -0,0 +1,92 @@
+"""Move ordering for alpha-beta.
+
+Alpha-beta prunes most when the best move is searched first.  A node's
+moves are ordered by, in turn:
+
+- the transposition table's best move for the position (found by the
+  previous iteration of iterative deepening, or earlier in this search);
+- the killer moves of its ply: the last two moves that caused a cutoff at
+  the same remaining depth elsewhere in the tree;
+- the history table, indexed by (player, column), which adds ``depth**2``
+  every time a column causes a cutoff;
+- the static centre-first order, precomputed once per board width.
+"""
+from functools import lru_cache
+
+from constants import AI_PLAYER, HUMAN_PLAYER
+
+# Killer moves kept per ply
+KILLERS = 2
+
+
+@lru_cache(maxsize=None)
+def center_order(cols):
+    """The columns of a board ``cols`` wide, centre first (left on ties)."""
+    center = cols // 2
+    return tuple(sorted(range(cols), key=lambda col: abs(col - center)))
+
+
+def ordered_moves(board, order):
+    """The valid moves of ``board`` in ``order`` (a permutation of the columns)."""
+    heights, rows = board.heights, board.rows
+    return [col for col in order if heights[col] < rows]
+
+
+def drop_mirrored(board, moves):
+    """``moves`` without those mirroring an earlier one when ``board`` is its
+    own mirror image: they score the same, and the earlier move would win
+    the tie anyway."""
+    if not board.is_symmetric():
+        return moves
+    kept = []
+    for col in moves:
+        if board.mirror_column(col) not in kept:
+            kept.append(col)
+    return kept
+
+
+class StaticOrdering:
+    """Centre-first order with the table move in front and nothing learned."""
+
+    def __init__(self, cols):
+        self.static = center_order(cols)
+
+    def order(self, board, depth, player, tt_move=None):
+        moves = ordered_moves(board, self.static)
+        if tt_move in moves and moves[0] != tt_move:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def cutoff(self, depth, player, col):
+        pass
+
+
+class MoveOrdering(StaticOrdering):
+    """Killer-move and history-heuristic ordering for one search.
+
+    ``order`` returns the moves to search at a node; ``cutoff`` is called
+    with the move that caused a cutoff there.  Killers are kept by
+    remaining depth, which within one search is the ply.
+    """
+
+    def __init__(self, cols):
+        super().__init__(cols)
+        self.killers = {}
+        self.history = {AI_PLAYER: [0] * cols, HUMAN_PLAYER: [0] * cols}
+
+    def order(self, board, depth, player, tt_move=None):
+        moves = ordered_moves(board, self.static)
+        history = self.history[player]
+        killers = self.killers.get(depth, ())
+        # sort is stable, so equal keys keep the static order
+        moves.sort(key=lambda col: (col != tt_move, col not in killers, -history[col]))
+        return moves
+
+    def cutoff(self, depth, player, col):
+        self.history[player][col] += depth * depth
+        killers = self.killers.setdefault(depth, [])
+        if col in killers:
+            killers.remove(col)
+        killers.insert(0, col)
+        del killers[KILLERS:]
@@ -0,0 +1,188 @@
+"""Root-split parallel search over a process pool.
+
+Each root move is searched in a worker process from the packed board
+(``Board.pack``).  Alpha-beta uses "young brothers wait": the first move is
+searched alone to get a bound, then the remaining moves are handed out at
+most ``workers`` at a time, each starting from the best score known when it
+is submitted.  Moves are searched with ``alpha = best - 1`` (scores are
+integers), so a later move that ties the best score still comes back exact
+and the first move in root order wins ties, exactly as in the serial search.
+
+Every worker keeps one transposition table, cleared whenever a task of a
+new root search arrives: entries left by earlier searches (of other
+positions or depths) would change the scores, so a parallel search returns
+what a serial search with a fresh table does.
+
+A stopped search records its id in a value shared with the workers, whose
+tasks poll it like the engines' own ``stop`` and abort, so they do not go
+on taking cores from the next search.
+"""
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from ai.alphabeta import alphabeta
+from ai.context import SearchAborted, SearchContext
+from ai.expected_minimax import compute_expected_value
+from ai.ordering import center_order, drop_mirrored, ordered_moves
+from ai.minimax import minimax
+from ai.transposition import TranspositionTable
+from board import Board
+from constants import AI_PLAYER
+
+# How often the parent checks the stop callable while waiting on workers
+POLL_SECONDS = 0.05
+# Nodes a worker searches between looks at the shared stopped search id
+STOP_CHECK_NODES = 1024
+
+_pools = {}
+_search_ids = itertools.count()
+# Highest search id stopped so far, shared with every worker
+_stopped = None
+_worker_tt = None
+_worker_search = None
+_worker_stopped = None
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _get_pool(workers):
+    global _stopped
+    if _stopped is None:
+        _stopped = multiprocessing.RawValue('q', -1)
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(_stopped,))
+    return pool
+
+
+def _init_worker(stopped):
+    global _worker_stopped
+    _worker_stopped = stopped
+
+
+def _stop_check(search):
+    # A stop callable for the engines; ids only grow, so every search up to
+    # the last one stopped is over
+    nodes = 0
+
+    def stop():
+        nonlocal nodes
+        nodes += 1
+        return nodes % STOP_CHECK_NODES == 0 and _worker_stopped.value >= search
+    return stop
+
+
+def _context(search):
+    # One table per worker process, shared by the tasks of one root search
+    global _worker_tt, _worker_search
+    if _worker_tt is None:
+        _worker_tt = TranspositionTable()
+    elif search != _worker_search:
+        _worker_tt.clear()
+    _worker_search = search
+    return SearchContext(_worker_tt, stop=_stop_check(search))
+
+
+def _alphabeta_child(search, state, col, depth, alpha):
+    board = Board.unpack(state)
+    board.drop_piece(col, AI_PLAYER)
+    return alphabeta(board, depth - 1, alpha, float('inf'), False, ctx=_context(search))
+
+
+def _minimax_child(search, state, col, depth):
+    board = Board.unpack(state)
+    board.drop_piece(col, AI_PLAYER)
+    return minimax(board, depth - 1, False, ctx=_context(search))
+
+
+def _expected_child(search, state, col, depth):
+    return compute_expected_value(Board.unpack(state), col, depth, ctx=_context(search))
+
+
+def _root_moves(board, first_move, center_first):
+    if center_first:
+        moves = ordered_moves(board, center_order(board.cols))
+    else:
+        moves = board.get_valid_moves()
+    if first_move in moves:
+        moves.remove(first_move)
+        moves.insert(0, first_move)
+    return drop_mirrored(board, moves)
+
+
+def _wait(pending, stop, search):
+    while True:
+        done, _ = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+        if done:
+            return done
+        if stop is not None and stop():
+            # Queued tasks are cancelled; running ones see the shared id
+            for future in pending:
+                future.cancel()
+            _stopped.value = search
+            raise SearchAborted()
+
+
+def _first_best(moves, scores):
+    best = max(scores.values())
+    return next(col for col in moves if scores.get(col) == best)
+
+
+def parallel_alphabeta_decision(board, depth, workers, first_move=None, stop=None):
+    moves = _root_moves(board, first_move, center_first=True)
+    if not moves:
+        return None
+    pool = _get_pool(workers)
+    search = next(_search_ids)
+    state = board.pack()
+
+    eldest = pool.submit(_alphabeta_child, search, state, moves[0], depth, float('-inf'))
+    scores = {moves[0]: _wait({eldest}, stop, search).pop().result()}
+    best = scores[moves[0]]
+
+    queue = list(moves[1:])
+    pending = {}
+    while queue or pending:
+        while queue and len(pending) < workers:
+            col = queue.pop(0)
+            future = pool.submit(_alphabeta_child, search, state, col, depth, best - 1)
+            pending[future] = (col, best - 1)
+        for future in _wait(pending, stop, search):
+            col, alpha = pending.pop(future)
+            score = future.result()
+            # At or below alpha is only a bound and cannot be the best move
+            if score > alpha:
+                scores[col] = score
+                best = max(best, score)
+
+    return _first_best(moves, scores)
+
+
+def _parallel_all(board, task, depth, workers, first_move, stop, center_first):
+    moves = _root_moves(board, first_move, center_first)
+    if not moves:
+        return None
+    pool = _get_pool(workers)
+    search = next(_search_ids)
+    state = board.pack()
+    pending = {pool.submit(task, search, state, col, depth): col for col in moves}
+    scores = {}
+    while pending:
+        for future in _wait(pending, stop, search):
+            scores[pending.pop(future)] = future.result()
+    return _first_best(moves, scores)
+
+
+def parallel_minimax_decision(board, depth, workers, first_move=None, stop=None):
+    return _parallel_all(board, _minimax_child, depth, workers, first_move, stop,
+                         center_first=False)
+
+
+def parallel_expected_minimax_decision(board, depth, workers, first_move=None, stop=None):
+    return _parallel_all(board, _expected_child, depth, workers, first_move, stop,
+                         center_first=False)
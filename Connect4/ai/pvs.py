@@ -0,0 +1,283 @@
+"""Principal variation search (NegaScout) with aspiration windows.
+
+Alpha-beta with the first move of every node searched on the full window
+and the rest on a null window ``(alpha, alpha + 1)``: with good ordering
+they only need to be shown no better, which prunes more.  A move that
+comes back better is searched again on the full window.  Scores are
+integers, so a null window is one point wide.
+
+The root is searched first on an aspiration window of
+``ASPIRATION_WINDOW`` around a guess: the transposition table's value for
+the root, stored by an earlier search at a depth of the same parity (the
+previous move's search, which met this position on its principal
+variation, or the iteration before last of iterative deepening).  If the
+result falls outside, the root is searched again with that side of the
+window opened.  The root keeps alpha-beta's move order and a tying move
+never replaces the best one, so the move is the one ``alphabeta_decision``
+picks at the same depth.
+"""
+import time
+
+from ai.alphabeta import _store
+from ai.context import SearchContext
+from ai.heuristic import compute_heuristic
+from ai.ordering import MoveOrdering, center_order, drop_mirrored, ordered_moves
+from ai.transposition import EXACT, LOWER, UPPER, position_key, table_move
+from constants import AI_PLAYER, HUMAN_PLAYER
+
+# Half-width of the root's first window, in heuristic points (a 3-in-a-row
+# window is worth 100)
+ASPIRATION_WINDOW = 50
+
+INF = float('inf')
+
+
+def pvs_decision(board, depth, tracer=None, leaf_evaluator=None, tt=None,
+                 stop=None, first_move=None, workers=None, stats=None, ordering=None):
+
+    if workers is not None and workers > 1:
+        if stats is not None:
+            raise ValueError("the parallel search does not collect stats")
+        # The parallel alpha-beta split returns the same move
+        from ai.parallel import parallel_alphabeta_decision
+        return parallel_alphabeta_decision(board, depth, workers, first_move, stop)
+
+    if tt is not None:
+        tt.new_search()
+    if ordering is None:
+        ordering = MoveOrdering(board.cols)
+    ctx = SearchContext(tt, leaf_evaluator, stop, tracer, stats, ordering)
+    if stats is not None:
+        started = time.perf_counter()
+
+    valid_moves = ordered_moves(board, center_order(board.cols))
+    if first_move in valid_moves:
+        valid_moves.remove(first_move)
+        valid_moves.insert(0, first_move)
+    valid_moves = drop_mirrored(board, valid_moves)
+
+    alpha, beta = -INF, INF
+    key = None
+    if tt is not None:
+        key = position_key(board, True)
+        entry = tt.probe(key)
+        # Scores swing between odd and even depths (whoever moved last is
+        # ahead), so only a guess searched at the same parity is close
+        if entry is not None and (depth - entry[1]) % 2 == 0:
+            alpha = entry[2] - ASPIRATION_WINDOW
+            beta = entry[2] + ASPIRATION_WINDOW
+
+    root_node = None
+    if tracer is not None:
+        root_node = tracer.begin(depth, alpha, beta)
+
+    while True:
+        best_score, best_col = _search_root(board, depth, valid_moves, alpha, beta,
+                                            root_node, ctx)
+        # Outside the window the score is only a bound: open that side
+        if best_score <= alpha > -INF:
+            alpha = -INF
+        elif best_score >= beta < INF:
+            beta = INF
+        else:
+            break
+        if stats is not None:
+            stats.aspiration_fails += 1
+
+    if tt is not None and best_col is not None:
+        tt.store(key, depth, best_score, EXACT, table_move(board, best_col))
+    if root_node is not None:
+        tracer.end(root_node, best_score, best_col)
+    if stats is not None:
+        stats.add_table(tt)
+        stats.wall_time += time.perf_counter() - started
+
+    return best_col
+
+
+def _search_root(board, depth, valid_moves, alpha, beta, root_node, ctx):
+    tracer = ctx.tracer
+    best_col = None
+    best_score = -INF
+    for i, col in enumerate(valid_moves):
+        board.drop_piece(col, AI_PLAYER)
+        child_node = None
+        if root_node is not None:
+            child_node = tracer.child(root_node, col, depth - 1, False, alpha, beta)
+
+        if i == 0:
+            score = pvs(board, depth - 1, alpha, beta, False, child_node, ctx)
+        else:
+            score = pvs(board, depth - 1, alpha, alpha + 1, False, child_node, ctx)
+            if alpha < score < beta:
+                child_node = _research(ctx, root_node, child_node, col, depth, False,
+                                       score, score, beta)
+                score = pvs(board, depth - 1, score, beta, False, child_node, ctx)
+        board.undo_piece(col)
+
+        if score > best_score:
+            best_score = score
+            best_col = col
+        alpha = max(alpha, best_score)
+
+        if child_node is not None:
+            tracer.close(child_node, score, alpha=alpha)
+        if alpha >= beta:
+            break
+
+    return best_score, best_col
+
+
+def _research(ctx, node, child_node, col, depth, is_maximizing, score, alpha, beta):
+    # A null-window search that failed high is searched again; in a traced
+    # tree the second search is its own child of ``node``
+    if ctx.stats is not None:
+        ctx.stats.researches += 1
+    if child_node is None:
+        return None
+    ctx.tracer.close(child_node, score)
+    return ctx.tracer.child(node, col, depth - 1, is_maximizing, alpha, beta)
+
+
+def pvs(board, depth, alpha, beta, maximizing, node=None, ctx=None):
+    # node is this position's tracer handle; None when nothing is traced
+    if ctx is None:
+        ctx = SearchContext()
+    ctx.visit()
+    stats = ctx.stats
+    if stats is not None:
+        stats.nodes_by_depth[depth] += 1
+
+    # Check for terminal states
+    if board.is_full():
+        if stats is not None:
+            stats.terminal_nodes += 1
+        ai_fours = board.count_fours(AI_PLAYER)
+        human_fours = board.count_fours(HUMAN_PLAYER)
+        return (ai_fours - human_fours) * 10000
+
+    if depth == 0:
+        if stats is not None:
+            return stats.evaluate(board)
+        return compute_heuristic(board)
+
+    if stats is not None:
+        started = time.perf_counter()
+
+    # Transposition table: cut off on a usable bound, else try its move first
+    tt = ctx.tt
+    key = None
+    tt_move = None
+    if tt is not None:
+        key = position_key(board, maximizing)
+        entry = tt.probe(key)
+        if entry is not None:
+            _, entry_depth, value, flag, move, _ = entry
+            if entry_depth >= depth and (flag == EXACT or
+                                         (flag == LOWER and value >= beta) or
+                                         (flag == UPPER and value <= alpha)):
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return value
+            tt_move = table_move(board, move)
+
+    ordering = ctx.ordering
+    if ordering is None:
+        ordering = ctx.ordering = MoveOrdering(board.cols)
+    player = AI_PLAYER if maximizing else HUMAN_PLAYER
+    valid_moves = ordering.order(board, depth, player, tt_move)
+    alpha_orig, beta_orig = alpha, beta
+    if stats is not None:
+        stats.movegen_time += time.perf_counter() - started
+
+    # Score all leaf children in one batch when an evaluator is given
+    leaf_scores = None
+    if depth == 1 and ctx.leaf_evaluator is not None:
+        if stats is not None:
+            leaf_scores = stats.evaluate_batch(ctx.leaf_evaluator, board, player, valid_moves)
+        else:
+            leaf_scores = ctx.leaf_evaluator(board, player, valid_moves)
+
+    tracer = ctx.tracer
+    if maximizing:
+        best = -INF
+        best_move = None
+        for i, col in enumerate(valid_moves):
+            child_node = None
+            if node is not None:
+                child_node = tracer.child(node, col, depth - 1, True, alpha, beta)
+
+            if leaf_scores is not None:
+                score = leaf_scores[i]
+            else:
+                board.drop_piece(col, AI_PLAYER)
+                if i == 0:
+                    score = pvs(board, depth - 1, alpha, beta, False, child_node, ctx)
+                else:
+                    # Null window: only whether this move beats alpha
+                    score = pvs(board, depth - 1, alpha, alpha + 1, False, child_node, ctx)
+                    if alpha < score < beta:
+                        child_node = _research(ctx, node, child_node, col, depth, True,
+                                               score, score, beta)
+                        score = pvs(board, depth - 1, score, beta, False, child_node, ctx)
+                board.undo_piece(col)
+
+            if score > best:
+                best = score
+                best_move = col
+            alpha = max(alpha, best)
+
+            if child_node is not None:
+                tracer.close(child_node, score, alpha=alpha)
+
+            if beta <= alpha:
+                ordering.cutoff(depth, player, col)
+                if stats is not None:
+                    stats.cutoff(i)
+                if node is not None:
+                    tracer.pruned(node, valid_moves[i + 1:], depth - 1, True, alpha, beta)
+                break
+
+        _store(tt, key, depth, best, alpha_orig, beta_orig, table_move(board, best_move))
+        return best
+    else:
+        best = INF
+        best_move = None
+        for i, col in enumerate(valid_moves):
+            child_node = None
+            if node is not None:
+                child_node = tracer.child(node, col, depth - 1, False, alpha, beta)
+
+            if leaf_scores is not None:
+                score = leaf_scores[i]
+            else:
+                board.drop_piece(col, HUMAN_PLAYER)
+                if i == 0:
+                    score = pvs(board, depth - 1, alpha, beta, True, child_node, ctx)
+                else:
+                    # Null window: only whether this move is below beta
+                    score = pvs(board, depth - 1, beta - 1, beta, True, child_node, ctx)
+                    if alpha < score < beta:
+                        child_node = _research(ctx, node, child_node, col, depth, False,
+                                               score, alpha, score)
+                        score = pvs(board, depth - 1, alpha, score, True, child_node, ctx)
+                board.undo_piece(col)
+
+            if score < best:
+                best = score
+                best_move = col
+            beta = min(beta, best)
+
+            if child_node is not None:
+                tracer.close(child_node, score, beta=beta)
+
+            if beta <= alpha:
+                ordering.cutoff(depth, player, col)
+                if stats is not None:
+                    stats.cutoff(i)
+                if node is not None:
+                    tracer.pruned(node, valid_moves[i + 1:], depth - 1, False, alpha, beta)
+                break
+
+        _store(tt, key, depth, best, alpha_orig, beta_orig, table_move(board, best_move))
+        return best
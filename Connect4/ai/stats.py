@@ -0,0 +1,150 @@
+"""Search statistics and profiling.
+
+Pass a ``SearchStats`` as ``stats=`` to a decision function and read it
+afterwards; like tracing, the engines only count when one is given.  The
+parallel search (``workers > 1``) collects none and rejects a ``stats``.
+``profile_call`` wraps any call in cProfile or tracemalloc; ``Game`` uses
+it around the search in ``find_ai_move``, so moves searched off the GUI
+thread are profiled as well as ``ai_move``.
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+
+from ai.heuristic import compute_heuristic
+
+
+class SearchStats:
+    """Counters filled in by the searches it is passed to.
+
+    nodes_by_depth: nodes visited, keyed by remaining depth
+    leaf_evaluations: heuristic scores taken at depth 0; leaves scored in a
+        batch by a leaf_evaluator count here and as depth-0 nodes
+    terminal_nodes: full boards reached
+    cutoffs / first_move_cutoffs: beta (or alpha) cutoffs, and those caused
+        by the first move searched
+    tt_cutoffs: nodes answered from the transposition table
+    tt_hits / tt_probes: from the table itself
+    chance_nodes: expectimax chance nodes searched
+    researches / aspiration_fails: PVS null-window searches that had to be
+        repeated on a full window, and root aspiration windows missed
+    heuristic_time / movegen_time: seconds spent scoring leaves and
+        generating and ordering moves, table probe included (the
+        incremental heuristic updates are part of drop_piece/undo_piece and
+        not counted here)
+    wall_time: seconds spent in the decision functions
+
+    One object may be passed to several searches (e.g. every iteration of
+    iterative deepening); the counts then add up.
+    """
+
+    def __init__(self):
+        self.nodes_by_depth = Counter()
+        self.leaf_evaluations = 0
+        self.terminal_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_cutoffs = 0
+        self.tt_hits = 0
+        self.tt_probes = 0
+        self.chance_nodes = 0
+        self.researches = 0
+        self.aspiration_fails = 0
+        self.heuristic_time = 0.0
+        self.movegen_time = 0.0
+        self.wall_time = 0.0
+
+    @property
+    def nodes(self):
+        return sum(self.nodes_by_depth.values())
+
+    def first_move_cutoff_ratio(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else None
+
+    def branching_factor(self):
+        """Nodes visited per expanded node (one not answered as a leaf,
+        terminal or from the table): the effective branching factor."""
+        expanded = (self.nodes - self.leaf_evaluations - self.terminal_nodes
+                    - self.tt_cutoffs)
+        return self.nodes / expanded if expanded > 0 else None
+
+    def evaluate(self, board):
+        started = time.perf_counter()
+        value = compute_heuristic(board)
+        self.heuristic_time += time.perf_counter() - started
+        self.leaf_evaluations += 1
+        return value
+
+    def evaluate_batch(self, leaf_evaluator, board, player, moves):
+        started = time.perf_counter()
+        scores = leaf_evaluator(board, player, moves)
+        self.heuristic_time += time.perf_counter() - started
+        self.leaf_evaluations += len(moves)
+        self.nodes_by_depth[0] += len(moves)
+        return scores
+
+    def cutoff(self, index):
+        # index: position of the move that caused it in the searched order
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+    def add_table(self, tt):
+        # The table counts per search (new_search resets it)
+        if tt is not None:
+            self.tt_hits += tt.hits
+            self.tt_probes += tt.hits + tt.misses
+
+    def as_dict(self):
+        return {
+            "nodes": self.nodes,
+            "nodes_by_depth": dict(sorted(self.nodes_by_depth.items(), reverse=True)),
+            "leaf_evaluations": self.leaf_evaluations,
+            "terminal_nodes": self.terminal_nodes,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_ratio": self.first_move_cutoff_ratio(),
+            "branching_factor": self.branching_factor(),
+            "tt_cutoffs": self.tt_cutoffs,
+            "tt_hits": self.tt_hits,
+            "tt_probes": self.tt_probes,
+            "chance_nodes": self.chance_nodes,
+            "researches": self.researches,
+            "aspiration_fails": self.aspiration_fails,
+            "heuristic_time": self.heuristic_time,
+            "movegen_time": self.movegen_time,
+            "wall_time": self.wall_time,
+        }
+
+
+PROFILERS = ("cprofile", "tracemalloc")
+
+
+def profile_call(kind, func, *args, **kwargs):
+    """Call ``func`` under a profiler; returns ``(result, report)``.
+
+    ``"cprofile"`` reports the pstats text of the 25 most expensive calls by
+    cumulative time; ``"tracemalloc"`` reports the peak traced memory and
+    the 10 lines that allocated most.
+    """
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        result = profiler.runcall(func, *args, **kwargs)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+        return result, out.getvalue()
+    if kind == "tracemalloc":
+        tracemalloc.start()
+        try:
+            result = func(*args, **kwargs)
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        top = snapshot.statistics("lineno")[:10]
+        lines = [f"peak: {peak / 1024:.1f} KiB"] + [str(stat) for stat in top]
+        return result, "\n".join(lines)
+    raise ValueError(f"unknown profiler {kind!r} (choose from {', '.join(PROFILERS)})")
@@ -0,0 +1,410 @@
+"""Search tracing.
+
+The engines report the nodes they visit to a tracer passed as ``tracer=`` to
+a decision function.  Without one (the default) they do no tracing work at
+all: every hook sits behind an ``if node is not None`` check and nothing
+from the GUI or graphviz is imported.
+
+A tracer hands out node handles and the engines only pass them back, so an
+implementation is free to store nodes however it likes.  A ``child`` call
+that returns None stops the tracing of that whole subtree, which is how the
+tracers below stay bounded:
+
+``TreeTracer`` builds a ``TreeNode`` tree, which ``gui.tree_visualizer`` can
+render, optionally limited to the top plies, a node budget and the
+principal variation plus a few siblings per ply.
+
+``JsonlTracer`` streams every node to a JSON-lines log as it is searched, so
+a huge search can be inspected later (``read_trace``/``load_tree``) without
+holding it in memory.
+
+``ScoreTracer`` only keeps the root score of each search (tracing nothing
+below the root unless it wraps another tracer), for callers that want a
+search's score as well as its move.
+"""
+import json
+
+
+class Tracer:
+    """Interface for search tracers; every hook is a no-op here."""
+
+    def begin(self, depth, alpha=None, beta=None):
+        """A search starts; returns the handle of its root node."""
+        return None
+
+    def child(self, parent, col, depth, is_maximizing, alpha=None, beta=None,
+              is_chance=False, probability=None):
+        """A child of ``parent`` is about to be searched; returns its handle."""
+        return None
+
+    def close(self, node, score, alpha=None, beta=None):
+        """``node`` was searched; alpha/beta, when given, are the parent's new bounds."""
+
+    def pruned(self, parent, cols, depth, is_maximizing, alpha, beta):
+        """The moves ``cols`` of ``parent`` were cut off."""
+
+    def end(self, root, score, best_col):
+        """The search finished with ``best_col``."""
+
+
+class TreeNode:
+    __slots__ = ('col', 'score', 'depth', 'is_maximizing', 'alpha', 'beta', 'children',
+                 'parent', 'pruned', 'id', 'is_chance', 'probability', 'ply')
+
+    def __init__(self, col, score, depth, is_maximizing, alpha, beta):
+        self.col = col
+        self.score = score
+        self.depth = depth
+        self.is_maximizing = is_maximizing
+        self.alpha = alpha
+        self.beta = beta
+        self.children = []
+        self.parent = None
+        self.pruned = False
+        self.id = None  # Unique identifier for graphviz
+        self.is_chance = False  # For expected minimax chance nodes
+        self.probability = None  # For expected minimax probabilities
+        self.ply = 0  # Moves from the root
+
+    def add_child(self, child):
+        child.parent = self
+        child.ply = self.ply + 1
+        self.children.append(child)
+
+
+class TreeTracer(Tracer):
+    """Builds the search tree out of ``TreeNode`` objects.
+
+    max_plies: only nodes at most this many moves below the root are kept
+    max_nodes: no nodes are added once the tree holds this many
+    pv_siblings: when set, the finished tree is cut down to the principal
+        variation plus this many siblings on each side of it per ply
+
+    ``on_end`` is called with the root when a search finishes; the root of
+    the last finished search is also kept in ``root``.  ``truncated`` counts
+    the children that were not recorded because of a limit.
+    """
+
+    def __init__(self, on_end=None, max_plies=None, max_nodes=None, pv_siblings=None):
+        self.on_end = on_end
+        self.max_plies = max_plies
+        self.max_nodes = max_nodes
+        self.pv_siblings = pv_siblings
+        self.root = None
+        self.nodes = 0
+        self.truncated = 0
+
+    def _full(self, parent, count=1):
+        if ((self.max_plies is not None and parent.ply >= self.max_plies) or
+                (self.max_nodes is not None and self.nodes + count > self.max_nodes)):
+            self.truncated += count
+            return True
+        self.nodes += count
+        return False
+
+    def begin(self, depth, alpha=None, beta=None):
+        self.nodes = 1
+        self.truncated = 0
+        return TreeNode(col="ROOT", score=None, depth=depth,
+                        is_maximizing=True, alpha=alpha, beta=beta)
+
+    def child(self, parent, col, depth, is_maximizing, alpha=None, beta=None,
+              is_chance=False, probability=None):
+        if self._full(parent):
+            return None
+        node = TreeNode(col=col, score=None, depth=depth,
+                        is_maximizing=is_maximizing, alpha=alpha, beta=beta)
+        node.is_chance = is_chance
+        node.probability = probability
+        parent.add_child(node)
+        return node
+
+    def close(self, node, score, alpha=None, beta=None):
+        node.score = score
+        if alpha is not None:
+            node.alpha = alpha
+        if beta is not None:
+            node.beta = beta
+
+    def pruned(self, parent, cols, depth, is_maximizing, alpha, beta):
+        if not cols or self._full(parent, len(cols)):
+            return
+        for col in cols:
+            node = TreeNode(col=col, score="pruned", depth=depth,
+                            is_maximizing=is_maximizing, alpha=alpha, beta=beta)
+            node.pruned = True
+            parent.add_child(node)
+
+    def end(self, root, score, best_col):
+        root.score = score
+        if self.pv_siblings is not None:
+            keep_principal_variation(root, self.pv_siblings)
+        self.root = root
+        if self.on_end is not None:
+            self.on_end(root)
+
+
+def keep_principal_variation(root, siblings):
+    """Cut a finished tree down to its principal variation.
+
+    At each node of the variation the child whose score is the node's own
+    (the first, on ties) is followed, and up to ``siblings`` children on
+    either side of it are kept as leaves.  Below a chance node every outcome
+    is part of the variation.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        children = node.children
+        if not children:
+            continue
+        if node.is_chance:
+            stack.extend(children)
+            continue
+        best = next((i for i, child in enumerate(children)
+                     if not child.pruned and child.score == node.score), None)
+        if best is None:
+            node.children = []
+            continue
+        node.children = children[max(0, best - siblings):best + siblings + 1]
+        for child in node.children:
+            if child is not children[best]:
+                child.children = []
+        stack.append(children[best])
+
+
+class JsonlTracer(Tracer):
+    """Streams the searched nodes to ``path`` as JSON lines.
+
+    Every search appends a ``{"search": n, "depth": d}`` header, then one
+    object per node as it is closed: its ``id``, ``parent`` id, ``col``,
+    ``ply``, remaining ``depth``, ``max``, ``alpha``, ``beta``, ``score``
+    (infinities as "inf"/"-inf"), and ``chance``, ``p`` and ``pruned``
+    where they apply.  The root (id 0) comes last with ``best``.  Only the
+    nodes on the current line are held in memory.  ``max_plies`` limits
+    the logged depth.  Searches are numbered on from the last one already
+    in the log, so runs appending to one file never reuse a number.
+    """
+
+    def __init__(self, path, max_plies=None):
+        self.path = path
+        self.max_plies = max_plies
+        self.file = None
+        self.searches = 0
+        self.next_id = 0
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+    def begin(self, depth, alpha=None, beta=None):
+        if self.file is None:
+            self.searches = max(self.searches, last_search(self.path))
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.searches += 1
+        self.next_id = 1
+        self._write({"search": self.searches, "depth": depth})
+        return {"id": 0, "parent": None, "col": None, "ply": 0, "depth": depth,
+                "max": True, "alpha": alpha, "beta": beta}
+
+    def child(self, parent, col, depth, is_maximizing, alpha=None, beta=None,
+              is_chance=False, probability=None):
+        ply = parent["ply"] + 1
+        if self.max_plies is not None and ply > self.max_plies:
+            return None
+        node = {"id": self.next_id, "parent": parent["id"], "col": col, "ply": ply,
+                "depth": depth, "max": is_maximizing, "alpha": alpha, "beta": beta}
+        if is_chance:
+            node["chance"] = True
+        if probability is not None:
+            node["p"] = probability
+        self.next_id += 1
+        return node
+
+    def close(self, node, score, alpha=None, beta=None):
+        if alpha is not None:
+            node["alpha"] = alpha
+        if beta is not None:
+            node["beta"] = beta
+        node["score"] = score
+        self._write(_finite(node))
+
+    def pruned(self, parent, cols, depth, is_maximizing, alpha, beta):
+        if self.max_plies is not None and parent["ply"] >= self.max_plies:
+            return
+        for col in cols:
+            self._write(_finite({"id": self.next_id, "parent": parent["id"], "col": col,
+                                 "ply": parent["ply"] + 1, "depth": depth,
+                                 "max": is_maximizing, "alpha": alpha, "beta": beta,
+                                 "pruned": True}))
+            self.next_id += 1
+
+    def end(self, root, score, best_col):
+        root["score"] = score
+        root["best"] = best_col
+        self._write(_finite(root))
+        self.file.flush()
+
+    def close_log(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ScoreTracer(Tracer):
+    """Keeps the ``score``, ``best_col`` and ``depth`` of the last search
+    that finished, passing every hook on to ``inner`` when one is given.
+
+    Without ``inner`` no node below the root is traced.  An aborted search
+    never reaches ``end``, so after iterative deepening these describe the
+    deepest iteration that finished.
+    """
+
+    def __init__(self, inner=None):
+        self.inner = inner
+        self.score = None
+        self.best_col = None
+        self.depth = None
+        self._depth = None
+        self._root = None
+
+    def begin(self, depth, alpha=None, beta=None):
+        # The engines only hand the root back, so ``self`` stands in for
+        # it and the inner tracer's root is kept here
+        self._depth = depth
+        self._root = self.inner.begin(depth, alpha, beta) if self.inner is not None else None
+        return self
+
+    def _node(self, node):
+        return self._root if node is self else node
+
+    def child(self, parent, col, depth, is_maximizing, alpha=None, beta=None,
+              is_chance=False, probability=None):
+        parent = self._node(parent)
+        if parent is None:
+            return None
+        return self.inner.child(parent, col, depth, is_maximizing, alpha, beta,
+                                is_chance, probability)
+
+    def close(self, node, score, alpha=None, beta=None):
+        self.inner.close(node, score, alpha, beta)
+
+    def pruned(self, parent, cols, depth, is_maximizing, alpha, beta):
+        parent = self._node(parent)
+        if parent is not None:
+            self.inner.pruned(parent, cols, depth, is_maximizing, alpha, beta)
+
+    def end(self, root, score, best_col):
+        self.score = score
+        self.best_col = best_col
+        self.depth = self._depth
+        if self._root is not None:
+            self.inner.end(self._root, score, best_col)
+
+
+def _finite(record):
+    # JSON has no infinities, so they are written as "inf" / "-inf"
+    for name in ("alpha", "beta", "score"):
+        value = record.get(name)
+        if value == float('inf') or value == float('-inf'):
+            record[name] = str(value)
+    return record
+
+
+def last_search(path):
+    """The number of the last search in a JsonlTracer log (0 if none)."""
+    last = 0
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                # Only the headers start with the search number
+                if line.startswith('{"search"'):
+                    last = json.loads(line)["search"]
+    except FileNotFoundError:
+        pass
+    return last
+
+
+def read_trace(path, search=None):
+    """Yield the node records of a JsonlTracer log one at a time.
+
+    With ``search`` given only that search's nodes (numbered from 1) are
+    yielded, otherwise every node of every search.
+    """
+    current = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if "search" in record:
+                current = record["search"]
+                if search is not None and current > search:
+                    return
+                continue
+            if search is None or current == search:
+                yield record
+
+
+def load_tree(path, search, max_plies=None):
+    """Rebuild one logged search as a TreeNode tree, e.g. for the visualizer."""
+    records = {}
+    for record in read_trace(path, search):
+        if max_plies is None or record["ply"] <= max_plies:
+            records[record["id"]] = record
+    nodes = {}
+    for node_id in sorted(records):
+        record = records[node_id]
+        node = TreeNode(col=record["col"] if node_id else "ROOT",
+                        score="pruned" if record.get("pruned") else _number(record.get("score")),
+                        depth=record["depth"], is_maximizing=record["max"],
+                        alpha=_number(record["alpha"]), beta=_number(record["beta"]))
+        node.pruned = record.get("pruned", False)
+        node.is_chance = record.get("chance", False)
+        node.probability = record.get("p")
+        nodes[node_id] = node
+        if record["parent"] is not None:
+            nodes[record["parent"]].add_child(node)
+    return nodes.get(0)
+
+
+def _number(value):
+    return float(value) if isinstance(value, str) else value
+
+
+def count_nodes(node):
+    count = 1
+    stack = list(node.children)
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+if __name__ == "__main__":
+    # Node rates of the same searches with and without a tracer
+    import time
+
+    from ai.alphabeta import alphabeta
+    from ai.context import SearchContext
+    from ai.minimax import minimax
+    from ai.transposition import TranspositionTable
+    from board import Board
+    from constants import ROWS, COLUMNS
+
+    def rate(search, depth, tracer):
+        ctx = SearchContext(TranspositionTable(), tracer=tracer)
+        root = tracer.begin(depth) if tracer is not None else None
+        start = time.perf_counter()
+        search(Board(ROWS, COLUMNS), depth, root, ctx)
+        return ctx.nodes / (time.perf_counter() - start), root
+
+    searches = (
+        ("alphabeta", 8, lambda board, depth, root, ctx: alphabeta(
+            board, depth, float('-inf'), float('inf'), True, root, ctx)),
+        ("minimax", 6, lambda board, depth, root, ctx: minimax(
+            board, depth, True, root, ctx)),
+    )
+    print(f"{'engine':>10} {'depth':>5} {'untraced n/s':>13} {'traced n/s':>11} {'tree nodes':>11}")
+    for name, depth, search in searches:
+        plain, _ = rate(search, depth, None)
+        traced, root = rate(search, depth, TreeTracer())
+        print(f"{name:>10} {depth:>5} {plain:>13.0f} {traced:>11.0f} {count_nodes(root):>11}")
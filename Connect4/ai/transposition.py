@@ -0,0 +1,71 @@
+"""Zobrist-keyed transposition table shared by the search engines.
+
+Entries are ``(key, depth, value, flag, move, generation)`` tuples in a fixed
+number of slots (``key % size``), sized from a memory cap.  A slot is
+overwritten when it is empty, was written by an earlier search, or holds a
+result searched no deeper than the new one (depth-preferred replacement).
+
+Values only depend on the position, the side to move and the remaining
+depth, so a table can be kept for a whole game and entries from previous
+turns are reused.  A position and its mirror image score the same, so
+positions are keyed by ``Board.canonical_key`` and share an entry; moves
+are stored in the columns of the canonical orientation (``table_move``).
+"""
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+DEFAULT_MEMORY_MB = 64
+# Rough footprint of one stored entry (tuple + its int objects)
+ENTRY_BYTES = 160
+
+# Mixed into the hash when the minimizing side is to move
+SIDE_KEY = 0x9E3779B97F4A7C15
+
+
+def position_key(board, maximizing):
+    key = board.canonical_key
+    return key if maximizing else key ^ SIDE_KEY
+
+
+def table_move(board, move):
+    """``move`` between ``board``'s columns and those of the entry keyed by
+    ``position_key``; the mapping is its own inverse."""
+    if move is None or not board.is_mirrored():
+        return move
+    return board.cols - 1 - move
+
+
+class TranspositionTable:
+    def __init__(self, memory_mb=DEFAULT_MEMORY_MB):
+        self.size = max(1, int(memory_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def new_search(self):
+        """Start a new search: age old entries and reset the counters."""
+        self.generation += 1
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, flag, move=None):
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, value, flag, move, self.generation)
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,86 @@
+"""NumPy heuristic evaluator that scores many positions in one call.
+
+Optional: only this module needs NumPy.  Positions are given as the
+``(ai_bits, human_bits)`` masks used by ``Board``; their bits are unpacked
+into a ``(N, cells)`` array and gathered through the precomputed windows of
+the board geometry, so every window of every position is counted at once.
+Results are identical to ``compute_heuristic`` / the terminal score used by
+the search engines.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from ai.heuristic import WINDOW_SCORES
+from constants import AI_PLAYER
+from geometry import get_geometry, GEOMETRY_CACHE_SIZE
+
+_SCORE_TABLE = np.array(WINDOW_SCORES, dtype=np.int64)
+
+
+@lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def _window_array(rows, cols):
+    return np.array(get_geometry(rows, cols).windows, dtype=np.intp)
+
+
+def _unpack(masks, n_cells):
+    """(N, n_cells) array holding the bits of N integer masks."""
+    n_bytes = (n_cells + 7) // 8
+    raw = b''.join(mask.to_bytes(n_bytes, 'little') for mask in masks)
+    packed = np.frombuffer(raw, dtype=np.uint8).reshape(len(masks), n_bytes)
+    return np.unpackbits(packed, axis=1, bitorder='little')[:, :n_cells]
+
+
+def window_counts(geometry, ai_masks, human_masks):
+    """Per-window piece counts of both players, each shaped (N, windows)."""
+    windows = _window_array(geometry.rows, geometry.cols)
+    n_cells = geometry.cols * geometry.stride
+    ai = _unpack(ai_masks, n_cells)[:, windows].sum(axis=2)
+    human = _unpack(human_masks, n_cells)[:, windows].sum(axis=2)
+    return ai, human
+
+
+def evaluate_positions(geometry, ai_masks, human_masks):
+    """Heuristic scores of many positions sharing one geometry."""
+    ai, human = window_counts(geometry, ai_masks, human_masks)
+    return _SCORE_TABLE[ai, human].sum(axis=1).tolist()
+
+
+def evaluate_boards(boards):
+    """Heuristic scores of a list of same-sized boards."""
+    if not boards:
+        return []
+    return evaluate_positions(boards[0].geometry,
+                              [board.ai_bits for board in boards],
+                              [board.human_bits for board in boards])
+
+
+def window_scores(board):
+    """Score of every window of one board, in ``Geometry.windows`` order."""
+    ai, human = window_counts(board.geometry, [board.ai_bits], [board.human_bits])
+    return _SCORE_TABLE[ai[0], human[0]]
+
+
+def score_children(board, player, moves):
+    """Leaf value of each child reached by ``player`` playing ``moves``.
+
+    Usable as the ``leaf_evaluator`` of ``alphabeta``/``minimax``: children
+    that fill the board get the terminal four-count score, the others the
+    heuristic.
+    """
+    stride = board.geometry.stride
+    ai_masks, human_masks = [], []
+    for col in moves:
+        bit = 1 << (col * stride + board.heights[col])
+        if player == AI_PLAYER:
+            ai_masks.append(board.ai_bits | bit)
+            human_masks.append(board.human_bits)
+        else:
+            ai_masks.append(board.ai_bits)
+            human_masks.append(board.human_bits | bit)
+
+    ai, human = window_counts(board.geometry, ai_masks, human_masks)
+    if sum(board.heights) == board.rows * board.cols - 1:
+        fours = (ai == 4).sum(axis=1) - (human == 4).sum(axis=1)
+        return (fours * 10000).tolist()
+    return _SCORE_TABLE[ai, human].sum(axis=1).tolist()
@@ -0,0 +1,213 @@
+"""Headless engine-vs-engine matches.
+
+    python arena.py alphabeta:depth=5 expectimax:time=500 --games 20 \\
+        --rows 6 --cols 7 --processes 4 --out results.jsonl
+
+An engine is ``name`` plus either ``depth=N`` or ``time=MS`` (the default is
+the menu's default depth).  Engine A moves first in even games and engine B
+in odd ones; ``--random-plies`` opens every game with that many random
+moves (from ``--seed``) so deterministic engines do not replay one game.
+Every move is the engines' own search; ``--endgame`` lets both hand the
+last moves to the exact endgame solver instead, as the GUI does, which
+hides their differences there.
+
+Games run in a process pool and each finished game is appended to the
+output at once, as JSON lines or CSV (by the file extension or
+``--format``).  A game is one ``move`` record per move (mover, column,
+latency, nodes, depth reached, the empty cells ``solved`` when the endgame
+solver found the move instead of a search, and the four counts after it)
+and then a ``game`` record with totals, the first mover and the winner.
+A summary goes to stderr.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ai.alphabeta import alphabeta_decision
+from ai.context import SearchProgress
+from ai.expected_minimax import expected_minimax_decision
+from ai.minimax import minimax_decision
+from ai.pvs import pvs_decision
+from constants import ROWS, COLUMNS, DEFAULT_DEPTH
+from game import Game
+
+ENGINES = {
+    "alphabeta": alphabeta_decision,
+    "pvs": pvs_decision,
+    "minimax": minimax_decision,
+    "expectimax": expected_minimax_decision,
+}
+
+FIELDS = ["record", "game", "ply", "mover", "engine", "col", "ms", "nodes", "depth",
+          "solved", "a_fours", "b_fours", "winner"]
+
+
+def parse_engine(spec):
+    """``"alphabeta:depth=5"`` -> ``("alphabeta", 5, None)``."""
+    name, _, limit = spec.partition(":")
+    if name not in ENGINES:
+        raise argparse.ArgumentTypeError(
+            f"unknown engine {name!r} (choose from {', '.join(ENGINES)})")
+    depth, time_ms = DEFAULT_DEPTH, None
+    if limit:
+        key, _, value = limit.partition("=")
+        if key not in ("depth", "time") or not value.isdigit() or int(value) < 1:
+            raise argparse.ArgumentTypeError(f"bad limit {limit!r} (use depth=N or time=MS)")
+        if key == "depth":
+            depth = int(value)
+        else:
+            time_ms = int(value)
+    return name, depth, time_ms
+
+
+def engine_label(engine):
+    name, depth, time_ms = engine
+    return f"{name}:time={time_ms}" if time_ms else f"{name}:depth={depth}"
+
+
+def play_game(index, engine_a, engine_b, rows, cols, random_plies, seed, endgame=False):
+    """Play one game and return its move records followed by its result.
+
+    Each side has its own Game in which its pieces are the AI's, so every
+    engine searches as the maximizing player; a move is played as the AI's
+    in the mover's game and as the human's in the other.
+    """
+    games = {}
+    for side, (name, depth, time_ms) in (("a", engine_a), ("b", engine_b)):
+        games[side] = Game(rows, cols, depth, ENGINES[name], time_budget_ms=time_ms,
+                           endgame=endgame)
+    labels = {"a": engine_label(engine_a), "b": engine_label(engine_b)}
+    other = {"a": "b", "b": "a"}
+    mover = "a" if index % 2 == 0 else "b"
+    rng = random.Random(f"{seed}-{index}")
+
+    records = []
+    ply = 0
+    while not games["a"].is_game_over():
+        game = games[mover]
+        progress = None
+        if ply < random_plies:
+            start = time.perf_counter()
+            col = rng.choice(game.board.get_valid_moves())
+        else:
+            progress = SearchProgress()
+            start = time.perf_counter()
+            col = game.find_ai_move(progress, anytime=False)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        game.play_ai_move(col)
+        games[other[mover]].human_move(col)
+        ply += 1
+        scores = games["a"].get_scores()
+        records.append({
+            "record": "move", "game": index, "ply": ply, "mover": mover,
+            "engine": labels[mover] if progress is not None else "random", "col": col,
+            "ms": round(elapsed_ms, 3),
+            "nodes": progress.nodes if progress is not None else 0,
+            "depth": progress.depth if progress is not None else 0,
+            "solved": progress.solved if progress is not None else None,
+            "a_fours": scores["ai"], "b_fours": scores["human"],
+        })
+        mover = other[mover]
+
+    scores = games["a"].get_scores()
+    if scores["ai"] > scores["human"]:
+        winner = "a"
+    elif scores["human"] > scores["ai"]:
+        winner = "b"
+    else:
+        winner = "draw"
+    records.append({
+        "record": "game", "game": index, "ply": ply,
+        "mover": "a" if index % 2 == 0 else "b", "engine": f"{labels['a']} vs {labels['b']}",
+        "ms": round(sum(r["ms"] for r in records), 3),
+        "nodes": sum(r["nodes"] for r in records),
+        "a_fours": scores["ai"], "b_fours": scores["human"], "winner": winner,
+    })
+    return records
+
+
+class ResultWriter:
+    """Appends records to a JSONL or CSV file, flushing after every game."""
+
+    def __init__(self, path, fmt):
+        self.file = open(path, "w", newline="", encoding="utf-8") if path else sys.stdout
+        self.csv = None
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self.csv is not None:
+                self.csv.writerow(record)
+            else:
+                self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def run_match(engine_a, engine_b, games, rows=ROWS, cols=COLUMNS, processes=None,
+              random_plies=0, seed=0, on_game=None, endgame=False):
+    """Play ``games`` games over a process pool and return the game results.
+
+    ``on_game(records)`` is called with each game's records as it finishes.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(play_game, index, engine_a, engine_b, rows, cols,
+                               random_plies, seed, endgame)
+                   for index in range(games)]
+        for future in as_completed(futures):
+            records = future.result()
+            if on_game is not None:
+                on_game(records)
+            results.append(records[-1])
+    return sorted(results, key=lambda result: result["game"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine Connect 4 matches.")
+    parser.add_argument("engine_a", type=parse_engine, help="e.g. alphabeta:depth=5")
+    parser.add_argument("engine_b", type=parse_engine, help="e.g. expectimax:time=500")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--cols", type=int, default=COLUMNS)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--random-plies", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--endgame", action=argparse.BooleanOptionalAction, default=False,
+                        help="let both engines use the exact endgame solver (default: off)")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=("jsonl", "csv"),
+                        help="output format (default: from --out, else jsonl)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if args.out and args.out.endswith(".csv") else "jsonl"
+    writer = ResultWriter(args.out, fmt)
+    try:
+        results = run_match(args.engine_a, args.engine_b, args.games, args.rows, args.cols,
+                            args.processes, args.random_plies, args.seed, writer.write,
+                            args.endgame)
+    finally:
+        writer.close()
+
+    wins = {"a": 0, "b": 0, "draw": 0}
+    for result in results:
+        wins[result["winner"]] += 1
+    print(f"{engine_label(args.engine_a)} vs {engine_label(args.engine_b)}: "
+          f"{wins['a']} wins, {wins['b']} losses, {wins['draw']} draws", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
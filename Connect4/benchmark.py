@@ -0,0 +1,210 @@
+"""Reproducible search benchmarks on fixed positions.
+
+    python benchmark.py --out bench.json
+    python benchmark.py --baseline bench.json --threshold 0.15
+    python benchmark.py --filter alphabeta/10x10
+    python benchmark.py --positions mid.pos --filter alphabeta
+
+Every position is a fixed move string (human first, as in the GUI) on a
+6x7, 7x7 or 10x10 board, at three stages: opening, midgame and near-full.
+Each engine is run at several depths with a fresh transposition table,
+reporting the fastest of ``--repeat`` wall times, nodes and nodes/sec; a
+separate run under tracemalloc gives the peak memory, so the timings carry
+no tracing cost.
+``alphabeta-static`` is alpha-beta with the centre-first move ordering
+only (no killer moves or history), to keep the ordering's gain in view.
+``compute_heuristic``, ``count_fours`` and ``Board.copy`` are timed per call
+on the same positions.  ``--positions`` runs on the boards of a position
+file (see ``positions.py``) instead, keyed by file name and index like
+``alphabeta/6x7/mid.pos#3/d4``.
+
+Results are written as JSON keyed like ``alphabeta/6x7/midgame/d4``.  With
+``--baseline`` every key is compared against an earlier run: a change in
+node count or a slowdown beyond ``--threshold`` (of runs long enough to
+time, ``MIN_COMPARED_S``) is reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from ai.alphabeta import alphabeta_decision
+from ai.context import SearchProgress
+from ai.expected_minimax import expected_minimax_decision
+from ai.heuristic import compute_heuristic
+from ai.minimax import minimax_decision
+from ai.ordering import StaticOrdering
+from ai.pvs import pvs_decision
+from ai.transposition import TranspositionTable
+from board import Board
+from constants import AI_PLAYER, HUMAN_PLAYER
+from positions import iter_positions
+
+# (rows, cols, stage, moves): column digits, human first
+POSITIONS = [
+    (6, 7, "opening", "1314"),
+    (6, 7, "midgame", "2052260614204325"),
+    (6, 7, "endgame", "5104644065661005331252254422243363"),
+    (7, 7, "opening", "0420"),
+    (7, 7, "midgame", "6231201361226146050"),
+    (7, 7, "endgame", "32034154206642553144153634620140662631530"),
+    (10, 10, "opening", "9482"),
+    (10, 10, "midgame", "9350608456217962095644434268397335970796"),
+    (10, 10, "endgame", "97018499009137206126002875322701163199332168708791979149721470023842427485885465463836536863"),
+]
+
+
+def alphabeta_static_decision(board, depth, **kwargs):
+    return alphabeta_decision(board, depth, ordering=StaticOrdering(board.cols), **kwargs)
+
+
+ENGINES = [
+    ("alphabeta", alphabeta_decision, (2, 4, 6, 8)),
+    ("alphabeta-static", alphabeta_static_decision, (4, 6, 8)),
+    ("pvs", pvs_decision, (2, 4, 6, 8)),
+    ("minimax", minimax_decision, (2, 4, 5)),
+    ("expectimax", expected_minimax_decision, (2, 3, 4)),
+]
+
+# Calls per timing of the board primitives
+MICRO_CALLS = 200000
+# Timed runs per benchmark; the fastest is reported
+DEFAULT_REPEAT = 3
+# Wall times shorter than this are too noisy to flag as regressions
+MIN_COMPARED_S = 0.01
+
+
+def make_board(rows, cols, moves):
+    board = Board(rows, cols)
+    player = HUMAN_PLAYER
+    for move in moves:
+        board.drop_piece(int(move), player)
+        player = AI_PLAYER if player == HUMAN_PLAYER else HUMAN_PLAYER
+    return board
+
+
+def bench_search(decision, board, depth, repeat=DEFAULT_REPEAT):
+    # Tables are built outside the measurements: allocating the slots takes
+    # longer than the smaller searches and would swamp their peak memory
+    wall = None
+    for _ in range(repeat):
+        progress = SearchProgress()
+        tt = TranspositionTable()
+        start = time.perf_counter()
+        col = decision(board.copy(), depth, tt=tt, stop=progress)
+        elapsed = time.perf_counter() - start
+        wall = elapsed if wall is None else min(wall, elapsed)
+
+    tt = TranspositionTable()
+    tracemalloc.start()
+    decision(board.copy(), depth, tt=tt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"move": col, "nodes": progress.nodes, "wall_s": round(wall, 6),
+            "nodes_per_s": round(progress.nodes / wall) if wall > 0 else None,
+            "peak_kib": round(peak / 1024, 1)}
+
+
+def bench_call(func, calls=MICRO_CALLS, repeat=DEFAULT_REPEAT):
+    wall = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        wall = elapsed if wall is None else min(wall, elapsed)
+    return {"calls": calls, "wall_s": round(wall, 6), "us_per_call": round(wall / calls * 1e6, 3)}
+
+
+def fixed_positions():
+    for rows, cols, stage, moves in POSITIONS:
+        yield f"{rows}x{cols}/{stage}", make_board(rows, cols, moves)
+
+
+def file_positions(path):
+    name = os.path.basename(path)
+    for index, board in enumerate(iter_positions(path)):
+        yield f"{board.rows}x{board.cols}/{name}#{index}", board
+
+
+def run(selected=None, repeat=DEFAULT_REPEAT, positions=None):
+    results = {}
+
+    def wanted(key):
+        return selected is None or selected in key
+
+    for where, board in positions if positions is not None else fixed_positions():
+        for name, decision, depths in ENGINES:
+            for depth in depths:
+                key = f"{name}/{where}/d{depth}"
+                if wanted(key):
+                    results[key] = bench_search(decision, board, depth, repeat)
+                    print(key, results[key], file=sys.stderr)
+        for name, func in (("compute_heuristic", lambda: compute_heuristic(board)),
+                           ("count_fours", lambda: board.count_fours(AI_PLAYER)),
+                           ("board_copy", board.copy)):
+            key = f"{name}/{where}"
+            if wanted(key):
+                results[key] = bench_call(func, repeat=repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a description of every regression against ``baseline``."""
+    problems = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if "nodes" in result and result["nodes"] != old.get("nodes"):
+            problems.append(f"{key}: nodes {old.get('nodes')} -> {result['nodes']}")
+        if (old["wall_s"] >= MIN_COMPARED_S and
+                result["wall_s"] > old["wall_s"] * (1 + threshold)):
+            problems.append(f"{key}: wall {old['wall_s']:.4f}s -> {result['wall_s']:.4f}s "
+                            f"(+{(result['wall_s'] / old['wall_s'] - 1) * 100:.0f}%)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Connect 4 engines.")
+    parser.add_argument("--out", help="write the results here (default: stdout)")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown against the baseline (default: 0.10)")
+    parser.add_argument("--filter", help="only run benchmarks whose key contains this")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per benchmark, fastest reported (default: 3)")
+    parser.add_argument("--positions", metavar="FILE",
+                        help="benchmark the boards of this position file instead of the fixed set")
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": run(args.filter, args.repeat,
+                       file_positions(args.positions) if args.positions else None),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        problems = compare(report["results"], baseline, args.threshold)
+        for problem in problems:
+            print("REGRESSION", problem, file=sys.stderr)
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
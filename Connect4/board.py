@@ -1,59 +1,292 @@
-import copy
+import base64
+
 from constants import EMPTY, AI_PLAYER, HUMAN_PLAYER
+from ai.heuristic import WINDOW_SCORES
+from geometry import get_geometry
 
 
 class Board:
+    """Connect 4 board stored as two bitboards plus per-column heights.
+
+    Cells are numbered column by column from the bottom up, with one spare
+    sentinel bit on top of every column (see ``geometry.Geometry``).
+    ``grid`` is still available as a list of rows (row 0 at the top) for
+    the GUI.
+
+    The four counts of both players, the heuristic score and the Zobrist
+    ``hash`` of the position are kept up to date by ``drop_piece`` and
+    ``undo_piece``, which only revisit the windows through the cell that
+    changed.  So is ``mirror_hash``, the hash of the position reflected left
+    to right: mirrored positions share ``canonical_key``.
+
+    ``to_bytes``/``from_bytes`` (and the base64 forms) serialize a position
+    as its size and the two bitboards, ``2 + 2 * ceil(cols * (rows + 1) / 8)``
+    bytes: 16 for 6x7.
+    """
+
     def __init__(self, rows, cols):
         self.rows = rows
         self.cols = cols
-        self.grid = [[EMPTY for _ in range(cols)] for _ in range(rows)]
+        self.ai_bits = 0
+        self.human_bits = 0
+        self.heights = [0] * cols
+        self.ai_fours = 0
+        self.human_fours = 0
+        self.heuristic_score = 0
+        self.hash = 0
+        self.mirror_hash = 0
+        self.geometry = get_geometry(rows, cols)
+
+    def _bit(self, row, col):
+        return 1 << (col * (self.rows + 1) + self.rows - 1 - row)
+
+    def get_cell(self, row, col):
+        bit = self._bit(row, col)
+        if self.ai_bits & bit:
+            return AI_PLAYER
+        if self.human_bits & bit:
+            return HUMAN_PLAYER
+        return EMPTY
+
+    @property
+    def grid(self):
+        rows, stride = self.rows, self.rows + 1
+        grid = [[EMPTY] * self.cols for _ in range(rows)]
+        for col, height in enumerate(self.heights):
+            for level in range(height):
+                bit = 1 << (col * stride + level)
+                grid[rows - 1 - level][col] = AI_PLAYER if self.ai_bits & bit else HUMAN_PLAYER
+        return grid
+
+    @grid.setter
+    def grid(self, grid):
+        self.ai_bits = 0
+        self.human_bits = 0
+        self.heights = [0] * self.cols
+        for row in range(self.rows):
+            for col in range(self.cols):
+                player = grid[row][col]
+                if player == EMPTY:
+                    continue
+                if player == AI_PLAYER:
+                    self.ai_bits |= self._bit(row, col)
+                else:
+                    self.human_bits |= self._bit(row, col)
+                self.heights[col] = max(self.heights[col], self.rows - row)
+        self._rescore()
+
+    def _rescore(self):
+        self.ai_fours = self.human_fours = self.heuristic_score = self.hash = 0
+        self.mirror_hash = 0
+        zobrist, mirror_zobrist = self.geometry.zobrist, self.geometry.mirror_zobrist
+        for index in range(self.cols * self.geometry.stride):
+            if self.ai_bits >> index & 1:
+                self.hash ^= zobrist[AI_PLAYER][index]
+                self.mirror_hash ^= mirror_zobrist[AI_PLAYER][index]
+            elif self.human_bits >> index & 1:
+                self.hash ^= zobrist[HUMAN_PLAYER][index]
+                self.mirror_hash ^= mirror_zobrist[HUMAN_PLAYER][index]
+        for mask in self.geometry.window_masks:
+            ai = (self.ai_bits & mask).bit_count()
+            human = (self.human_bits & mask).bit_count()
+            self.heuristic_score += WINDOW_SCORES[ai][human]
+            if ai == 4:
+                self.ai_fours += 1
+            elif human == 4:
+                self.human_fours += 1
 
     def drop_piece(self, col, player):
-        for row in range(self.rows - 1, -1, -1):
-            if self.grid[row][col] == EMPTY:
-                self.grid[row][col] = player
-                return row
-        return -1
+        height = self.heights[col]
+        if height == self.rows:
+            return -1
+        index = col * (self.rows + 1) + height
+        bit = 1 << index
+        ai_bits, human_bits = self.ai_bits, self.human_bits
+        delta = 0
+        if player == AI_PLAYER:
+            for mask in self.geometry.cell_masks[index]:
+                ai = (ai_bits & mask).bit_count()
+                human = (human_bits & mask).bit_count()
+                delta += WINDOW_SCORES[ai + 1][human] - WINDOW_SCORES[ai][human]
+                if ai == 3:
+                    self.ai_fours += 1
+            self.ai_bits = ai_bits | bit
+        else:
+            for mask in self.geometry.cell_masks[index]:
+                ai = (ai_bits & mask).bit_count()
+                human = (human_bits & mask).bit_count()
+                delta += WINDOW_SCORES[ai][human + 1] - WINDOW_SCORES[ai][human]
+                if human == 3:
+                    self.human_fours += 1
+            self.human_bits = human_bits | bit
+        self.heuristic_score += delta
+        self.hash ^= self.geometry.zobrist[player][index]
+        self.mirror_hash ^= self.geometry.mirror_zobrist[player][index]
+        self.heights[col] = height + 1
+        return self.rows - 1 - height
+
+    def undo_piece(self, col):
+        # Like drop_piece on a full column, an empty one is left alone
+        height = self.heights[col] - 1
+        if height < 0:
+            return -1
+        index = col * (self.rows + 1) + height
+        bit = 1 << index
+        delta = 0
+        if self.ai_bits & bit:
+            ai_bits = self.ai_bits = self.ai_bits & ~bit
+            human_bits = self.human_bits
+            for mask in self.geometry.cell_masks[index]:
+                ai = (ai_bits & mask).bit_count()
+                human = (human_bits & mask).bit_count()
+                delta += WINDOW_SCORES[ai][human] - WINDOW_SCORES[ai + 1][human]
+                if ai == 3:
+                    self.ai_fours -= 1
+            self.hash ^= self.geometry.zobrist[AI_PLAYER][index]
+            self.mirror_hash ^= self.geometry.mirror_zobrist[AI_PLAYER][index]
+        else:
+            human_bits = self.human_bits = self.human_bits & ~bit
+            ai_bits = self.ai_bits
+            for mask in self.geometry.cell_masks[index]:
+                ai = (ai_bits & mask).bit_count()
+                human = (human_bits & mask).bit_count()
+                delta += WINDOW_SCORES[ai][human] - WINDOW_SCORES[ai][human + 1]
+                if human == 3:
+                    self.human_fours -= 1
+            self.hash ^= self.geometry.zobrist[HUMAN_PLAYER][index]
+            self.mirror_hash ^= self.geometry.mirror_zobrist[HUMAN_PLAYER][index]
+        self.heuristic_score += delta
+        self.heights[col] = height
+        return self.rows - 1 - height
 
     def is_valid_column(self, col):
-        return 0 <= col < self.cols and self.grid[0][col] == EMPTY
+        return 0 <= col < self.cols and self.heights[col] < self.rows
 
     def get_valid_moves(self):
-        return [col for col in range(self.cols) if self.is_valid_column(col)]
+        rows = self.rows
+        return [col for col, height in enumerate(self.heights) if height < rows]
+
+    @property
+    def canonical_key(self):
+        """The smaller of ``hash`` and ``mirror_hash``: equal for a position
+        and its mirror image."""
+        return self.hash if self.hash <= self.mirror_hash else self.mirror_hash
+
+    def is_mirrored(self):
+        """True when ``canonical_key`` is the mirror image's hash, i.e. moves
+        stored under it are in reflected columns."""
+        return self.mirror_hash < self.hash
+
+    def is_symmetric(self):
+        # Equal hashes: the position is its own mirror image
+        return self.hash == self.mirror_hash
+
+    def mirror_column(self, col):
+        return self.cols - 1 - col
+
+    def mirror(self):
+        """A new board holding the position reflected left to right."""
+        stride = self.rows + 1
+        column = (1 << stride) - 1
+        ai_bits = human_bits = 0
+        for col in range(self.cols):
+            shift = (self.cols - 1 - col) * stride
+            ai_bits |= (self.ai_bits >> (col * stride) & column) << shift
+            human_bits |= (self.human_bits >> (col * stride) & column) << shift
+        return Board.unpack((self.rows, self.cols, ai_bits, human_bits))
 
     def count_fours(self, player):
-        count = 0
-        
-        # Horizontal
-        for row in range(self.rows):
-            for col in range(self.cols - 3):
-                if all(self.grid[row][col + i] == player for i in range(4)):
-                    count += 1
-        
-        # Vertical
-        for row in range(self.rows - 3):
-            for col in range(self.cols):
-                if all(self.grid[row + i][col] == player for i in range(4)):
-                    count += 1
-        
-        # Diagonal /
-        for row in range(3, self.rows):
-            for col in range(self.cols - 3):
-                if all(self.grid[row - i][col + i] == player for i in range(4)):
-                    count += 1
-        
-        # Diagonal \
-        for row in range(self.rows - 3):
-            for col in range(self.cols - 3):
-                if all(self.grid[row + i][col + i] == player for i in range(4)):
-                    count += 1
-        
-        return count
+        return self.ai_fours if player == AI_PLAYER else self.human_fours
 
     def is_full(self):
-        return all(self.grid[0][col] != EMPTY for col in range(self.cols))
+        rows = self.rows
+        return all(height == rows for height in self.heights)
+
+    def pack(self):
+        """Compact picklable form of the position, see ``unpack``."""
+        return self.rows, self.cols, self.ai_bits, self.human_bits
+
+    @classmethod
+    def unpack(cls, state):
+        rows, cols, ai_bits, human_bits = state
+        board = cls(rows, cols)
+        board.ai_bits = ai_bits
+        board.human_bits = human_bits
+        column = (1 << rows) - 1
+        filled = ai_bits | human_bits
+        board.heights = [(filled >> (col * (rows + 1)) & column).bit_length()
+                         for col in range(cols)]
+        board._rescore()
+        return board
+
+    def to_bytes(self):
+        """Rows, columns and the AI and human bitboards, see ``from_bytes``."""
+        return bytes((self.rows, self.cols)) + self.bitboards_to_bytes()
+
+    def bitboards_to_bytes(self):
+        """The two bitboards, little-endian, without the board size."""
+        size = self.geometry.bitboard_bytes
+        return self.ai_bits.to_bytes(size, 'little') + self.human_bits.to_bytes(size, 'little')
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < 2:
+            raise ValueError("position data too short")
+        return cls.from_bitboard_bytes(data[0], data[1], data[2:])
+
+    @classmethod
+    def from_bitboard_bytes(cls, rows, cols, data):
+        """A board of this size from ``bitboards_to_bytes`` output.
+
+        Raises ValueError unless the data is a position that can arise in a
+        game: the right length, no cell held by both players and no piece
+        above an empty cell.  (Piece counts are not checked: the AI may have
+        moved first.)
+        """
+        if not (0 < rows < 256 and 0 < cols < 256):
+            raise ValueError(f"bad board size {rows}x{cols}")
+        size = get_geometry(rows, cols).bitboard_bytes
+        if len(data) != 2 * size:
+            raise ValueError(f"expected {2 * size} bytes of bitboards for {rows}x{cols}, "
+                             f"got {len(data)}")
+        ai_bits = int.from_bytes(data[:size], 'little')
+        human_bits = int.from_bytes(data[size:], 'little')
+        if ai_bits & human_bits:
+            raise ValueError("a cell is held by both players")
+        filled = ai_bits | human_bits
+        stride = rows + 1
+        column = (1 << rows) - 1
+        if filled >> (cols * stride):
+            raise ValueError("pieces outside the board")
+        for col in range(cols):
+            cells = filled >> (col * stride) & ((1 << stride) - 1)
+            if cells & ~column or cells & (cells + 1):
+                raise ValueError(f"column {col} has a piece above an empty cell")
+        return cls.unpack((rows, cols, ai_bits, human_bits))
+
+    def to_base64(self):
+        """``to_bytes`` as URL-safe base64 text, e.g. for logs and JSON."""
+        return base64.urlsafe_b64encode(self.to_bytes()).decode('ascii')
+
+    @classmethod
+    def from_base64(cls, text):
+        try:
+            data = base64.urlsafe_b64decode(text)
+        except ValueError as e:
+            raise ValueError(f"bad base64 position {text!r}") from e
+        return cls.from_bytes(data)
 
     def copy(self):
-        new_board = Board(self.rows, self.cols)
-        new_board.grid = copy.deepcopy(self.grid)
-        return new_board
\ No newline at end of file
+        new_board = Board.__new__(Board)
+        new_board.rows = self.rows
+        new_board.cols = self.cols
+        new_board.ai_bits = self.ai_bits
+        new_board.human_bits = self.human_bits
+        new_board.heights = self.heights[:]
+        new_board.ai_fours = self.ai_fours
+        new_board.human_fours = self.human_fours
+        new_board.heuristic_score = self.heuristic_score
+        new_board.hash = self.hash
+        new_board.mirror_hash = self.mirror_hash
+        new_board.geometry = self.geometry
+        return new_board
@@ -1,3 +1,5 @@
+import os
+
 ROWS = 6
 COLUMNS = 7
 
@@ -18,4 +20,27 @@ COLORS = {
 
 DEFAULT_DEPTH = 4
 MIN_DEPTH = 1
-MAX_DEPTH = 8
\ No newline at end of file
+MAX_DEPTH = 8
+
+DEFAULT_TIME_MS = 1000
+MIN_TIME_MS = 100
+MAX_TIME_MS = 60000
+
+# Where ai.book writes and Game's callers look for opening books: next to
+# this file, so the shipped books are found from any working directory
+BOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_books')
+
+# Finished games (game_log.GameLog): the file, its size before it is
+# rotated and the rotated files kept
+GAME_LOG = 'game_logs/games.jsonl'
+GAME_LOG_MAX_BYTES = 4 * 1024 * 1024
+GAME_LOG_BACKUPS = 3
+
+# Search tree shown by the visualizer: top plies and node budget
+TREE_MAX_PLIES = 4
+TREE_MAX_NODES = 2000
+
+# How often the game screen checks on the AI's search
+AI_POLL_MS = 100
+# Quiet time after the last resize event before the board is redrawn
+RESIZE_DEBOUNCE_MS = 80
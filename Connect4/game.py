@@ -1,33 +1,212 @@
+import time
+
 from ai.alphabeta import alphabeta_decision
+from ai.context import SearchAborted
+from ai.endgame import EndgameSolver, empty_cells, endgame_threshold
+from ai.iterative import iterative_deepening_decision
+from ai.stats import SearchStats, profile_call
+from ai.tracer import ScoreTracer
+from ai.transposition import TranspositionTable
 from board import Board
 from constants import AI_PLAYER, HUMAN_PLAYER
 
 
 class Game:
-    def __init__(self, rows, cols, depth, ai_func):
+    def __init__(self, rows, cols, depth, ai_func, time_budget_ms=None, workers=None,
+                 tracer=None, collect_stats=False, profile=None, book=None, endgame=True,
+                 log=None):
         self.board = Board(rows, cols)
         self.depth = depth
         self.ai_func = ai_func
+        # When set, the AI searches as deep as fits in this many ms per move
+        self.time_budget_ms = time_budget_ms
+        # Worker processes for the root-split parallel search (None = serial)
+        self.workers = workers
+        # Receives the searched nodes (ai.tracer); None searches untraced
+        self.tracer = tracer
+        # When set, last_stats holds the ai.stats.SearchStats of the last search
+        # (None after a book or endgame move, and with parallel workers)
+        self.collect_stats = collect_stats
+        self.last_stats = None
+        # "cprofile" or "tracemalloc" to profile every find_ai_move (and so
+        # ai_move) into last_profile
+        self.profile = profile
+        self.last_profile = None
+        # ai.book.OpeningBook consulted before searching when it was built at
+        # this depth (or the game is timed); None always searches
+        self.book = book
+        # Solves the game exactly once few cells are empty; None always searches
+        self.endgame = EndgameSolver() if endgame else None
+        # game_log.GameLog that every finished game is appended to; None keeps none
+        self.log = log
+        # Every move so far, see play_ai_move and record()
+        self.moves = []
+        # How find_ai_move found its last move, recorded when it is played
+        self.last_search = None
         self.game_over = False
         self.winner = None
         self.ai_fours = 0
         self.human_fours = 0
+        # Kept for the whole game so later turns reuse earlier searches
+        self.tt = TranspositionTable()
 
     def ai_move(self):
         if self.game_over:
             return None
-        col = self.ai_func(self.board, self.depth)
+        col = self.find_ai_move()
+        self.play_ai_move(col)
+        return col
+
+    def find_ai_move(self, progress=None, anytime=True):
+        """Search the AI's move without playing it.
+
+        With a ``progress`` (ai.context.SearchProgress) the search runs by
+        iterative deepening on a copy of the board, up to the depth or time
+        limit, so it may run off the main thread and stopping it still gives
+        the best move found so far.  ``anytime=False`` skips the shallower
+        iterations of a fixed-depth search when it will not be stopped and
+        ``progress`` only counts its nodes.  A move found in the opening
+        book is returned without searching, and near the end of the game
+        the endgame solver replaces the search.
+
+        ``last_search`` then holds the move with where it came from
+        (``source``: book, endgame or search), the search ``depth`` and
+        score behind it when known and the time taken.  An endgame move has
+        no search depth: its ``solved`` is the number of empty cells solved
+        (None for the other sources).
+        """
+        if self.game_over:
+            return None
+        started = time.perf_counter()
+        if self.profile:
+            (col, found), self.last_profile = profile_call(self.profile, self._choose_move,
+                                                           progress, anytime)
+        else:
+            col, found = self._choose_move(progress, anytime)
+        self.last_search = dict(found, col=col, engine=self.ai_func.__name__,
+                                ms=round((time.perf_counter() - started) * 1000, 3))
+        return col
+
+    def _choose_move(self, progress, anytime):
+        # The move and the source, depth, solved and score fields of last_search
+        col = self._book_move()
         if col is not None:
-            self.board.drop_piece(col, AI_PLAYER)
-            self._check_game_end()
+            self.last_stats = None
+            if progress is not None:
+                progress.iteration_done(self.book.depth, col)
+            return col, {"source": "book", "depth": self.book.depth, "solved": None,
+                         "score": None}
+        col = self._endgame_move(progress)
+        if col is not None:
+            self.last_stats = None
+            return col, {"source": "endgame", "depth": None, "solved": empty_cells(self.board),
+                         "score": self.endgame.value(self.board.copy())}
+        scores = ScoreTracer(self.tracer)
+        col = self._search_move(progress, anytime, scores)
+        # Parallel searches are not traced; their depth is the one asked for
+        depth = scores.depth
+        if depth is None and not self.time_budget_ms:
+            depth = self.depth
+        return col, {"source": "search", "depth": depth, "solved": None,
+                     "score": scores.score}
+
+    def _search_move(self, progress, anytime, tracer):
+        # The parallel search's nodes are counted in its workers, so it has none
+        parallel = self.workers is not None and self.workers > 1
+        stats = SearchStats() if self.collect_stats and not parallel else None
+        self.last_stats = stats
+        search = dict(tt=self.tt, workers=self.workers, tracer=tracer, stats=stats)
+        on_iteration = progress.iteration_done if progress is not None else None
+        if self.time_budget_ms:
+            return iterative_deepening_decision(self.board, self.time_budget_ms,
+                                                decision=self.ai_func, stop=progress,
+                                                on_iteration=on_iteration, **search)
+        if progress is None:
+            return self.ai_func(self.board, self.depth, **search)
+        if not anytime:
+            col = self.ai_func(self.board.copy(), self.depth, stop=progress, **search)
+            progress.iteration_done(self.depth, col)
+            return col
+
+        # The shallower iterations only give a stopped search a move to fall
+        # back on; the full depth is searched as the plain call above would
+        col = iterative_deepening_decision(self.board, None, decision=self.ai_func,
+                                           max_depth=self.depth - 1, stop=progress,
+                                           on_iteration=on_iteration, **search)
+        if progress.stopped:
+            return col
+        try:
+            col = self.ai_func(self.board.copy(), self.depth, stop=progress, **search)
+        except SearchAborted:
+            return col
+        progress.iteration_done(self.depth, col)
         return col
 
+    def _book_move(self):
+        # Only a book searched at this game's depth: it stands in for the
+        # search, so a shallower game keeps the difficulty it was set to
+        if self.book is None or (not self.time_budget_ms and self.book.depth != self.depth):
+            return None
+        col = self.book.lookup(self.board)
+        if col is None or not self.board.is_valid_column(col):
+            return None
+        return col
+
+    def _endgame_move(self, progress=None):
+        empty = empty_cells(self.board)
+        if self.endgame is None or empty > endgame_threshold(self.board.rows, self.board.cols):
+            return None
+        try:
+            col = self.endgame.best_move(self.board.copy(), stop=progress)
+        except SearchAborted:
+            # Stopped: the search below returns its fallback move at once
+            return None
+        if progress is not None:
+            progress.endgame_done(empty, col)
+        return col
+
+    def play_ai_move(self, col):
+        """Play the AI's ``col``, recorded with ``last_search`` when that
+        found it."""
+        search, self.last_search = self.last_search, None
+        if col is not None and not self.game_over:
+            move = {"player": "ai", "col": col}
+            if search is not None and search["col"] == col:
+                move.update(search)
+            self._play(col, AI_PLAYER, move)
+
     def human_move(self, col):
         if self.game_over:
             return
         if self.board.is_valid_column(col):
-            self.board.drop_piece(col, HUMAN_PLAYER)
-            self._check_game_end()
+            self._play(col, HUMAN_PLAYER, {"player": "human", "col": col})
+
+    def _play(self, col, player, move):
+        self.board.drop_piece(col, player)
+        self.moves.append(move)
+        self._check_game_end()
+        if self.game_over and self.log is not None:
+            self.log.write(self.record())
+
+    def record(self):
+        """The game so far as a JSON-ready dict: the board size, the AI's
+        engine and limits, ``moves`` in order and, once over, the result.
+
+        Each move has its ``player`` ("ai" or "human") and ``col``; the AI's
+        searched moves add ``last_search``'s fields.  Scores are the
+        engine's for search moves (heuristic units, a won position
+        +-10000 per four) and the final four-count difference for endgame
+        moves, both from the AI's side.
+        """
+        result = None
+        if self.game_over:
+            result = {"ai_fours": self.ai_fours, "human_fours": self.human_fours,
+                      "winner": {AI_PLAYER: "ai", HUMAN_PLAYER: "human"}.get(self.winner, "draw")}
+        return {
+            "rows": self.board.rows, "cols": self.board.cols,
+            "engine": self.ai_func.__name__, "depth": self.depth,
+            "time_ms": self.time_budget_ms, "moves": self.moves, "result": result,
+        }
 
     def _check_game_end(self):
         if self.board.is_full():
@@ -56,6 +235,8 @@ class Game:
 
     def reset(self):
         self.board = Board(self.board.rows, self.board.cols)
+        self.moves = []
+        self.last_search = None
         self.game_over = False
         self.winner = None
         self.ai_fours = 0
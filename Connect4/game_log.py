@@ -0,0 +1,73 @@
+"""Rotating JSON-lines log of finished games.
+
+Each line is one ``Game.record()``: the board size, the AI's engine and
+limits, every move in order and the result.  When a write would take the
+file past ``max_bytes`` it is renamed to ``<path>.1`` (the older files to
+``.2``, ``.3``, ... up to ``backups``, the oldest dropped) and a new file is
+started, so a long-running GUI or self-play session keeps a bounded log.
+``read_games`` yields the games of all the files, oldest first.
+"""
+import json
+import os
+
+from constants import GAME_LOG_MAX_BYTES, GAME_LOG_BACKUPS
+
+
+def _backup(path, number):
+    return f"{path}.{number}"
+
+
+class GameLog:
+    """Appends game records to ``path``, rotating it as described above."""
+
+    def __init__(self, path, max_bytes=GAME_LOG_MAX_BYTES, backups=GAME_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':')) + "\n"
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(line) > self.max_bytes:
+            self._rotate()
+        # Opened per game: games are rare and nothing is left open between them
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _rotate(self):
+        if self.backups < 1:
+            os.remove(self.path)
+            return
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(_backup(self.path, number)):
+                os.replace(_backup(self.path, number), _backup(self.path, number + 1))
+        os.replace(self.path, _backup(self.path, 1))
+
+
+def log_files(path):
+    """The files of the log at ``path``, oldest first."""
+    backups = []
+    number = 1
+    while os.path.exists(_backup(path, number)):
+        backups.append(_backup(path, number))
+        number += 1
+    files = backups[::-1]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_games(path):
+    """Yield the game records of the log at ``path`` (rotated files
+    included), oldest first."""
+    for name in log_files(path):
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,71 @@
+import random
+from functools import lru_cache
+
+from constants import AI_PLAYER, HUMAN_PLAYER
+
+# Menu allows 4..10 rows and columns; only a handful are in use at once
+GEOMETRY_CACHE_SIZE = 16
+
+
+class Geometry:
+    """Winning-line tables for one board size.
+
+    Cells are addressed by their bit index in ``Board``'s bitboards
+    (``col * (rows + 1) + level``, level 0 at the bottom).  ``windows`` holds
+    the four cell indices of every horizontal, vertical and diagonal line,
+    ``window_masks`` the same lines as bit masks, and ``cell_windows`` /
+    ``cell_masks`` map each cell to the windows that contain it.
+
+    ``zobrist`` holds one random 64-bit key per (player, cell).  The keys are
+    seeded from the board size, so position hashes are stable across runs.
+    ``mirror_zobrist`` holds the key of the mirror-image cell (same level,
+    column ``cols - 1 - col``), giving the hash of the reflected position.
+
+    ``bitboard_bytes`` is the size of one bitboard in ``Board.to_bytes``.
+    """
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.stride = rows + 1
+        self.bitboard_bytes = (cols * self.stride + 7) // 8
+
+        windows = []
+        for d_col, d_level in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            for col in range(cols):
+                for level in range(rows):
+                    cells = [(col + i * d_col, level + i * d_level) for i in range(4)]
+                    if all(0 <= c < cols and 0 <= l < rows for c, l in cells):
+                        windows.append(tuple(self.index(c, l) for c, l in cells))
+        self.windows = tuple(windows)
+        self.window_masks = tuple(sum(1 << i for i in cells) for cells in windows)
+        self.grid_windows = tuple(tuple(self.position(i) for i in cells) for cells in windows)
+
+        cell_windows = [[] for _ in range(cols * self.stride)]
+        for window_id, cells in enumerate(windows):
+            for i in cells:
+                cell_windows[i].append(window_id)
+        self.cell_windows = tuple(tuple(ids) for ids in cell_windows)
+        self.cell_masks = tuple(tuple(self.window_masks[w] for w in ids)
+                                for ids in self.cell_windows)
+
+        rng = random.Random(f"zobrist-{rows}x{cols}")
+        self.zobrist = {player: tuple(rng.getrandbits(64) for _ in range(cols * self.stride))
+                        for player in (AI_PLAYER, HUMAN_PLAYER)}
+        mirrored = [self.index(cols - 1 - col, level) for col in range(cols)
+                    for level in range(self.stride)]
+        self.mirror_zobrist = {player: tuple(keys[i] for i in mirrored)
+                               for player, keys in self.zobrist.items()}
+
+    def index(self, col, level):
+        return col * self.stride + level
+
+    def position(self, index):
+        """Grid (row, col) of a cell index, row 0 being the top row."""
+        col, level = divmod(index, self.stride)
+        return self.rows - 1 - level, col
+
+
+@lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def get_geometry(rows, cols):
+    return Geometry(rows, cols)
@@ -1,8 +1,11 @@
 import tkinter as tk
 from gui.menu import MainMenuGUI
 from gui.game_screen import GameScreenGUI
+from gui.tree_visualizer import visualizer, start_visualization
 from game import Game
-from constants import ROWS, COLUMNS, BG_COLOR
+from game_log import GameLog
+from ai.book import BOOK_ENGINES, open_book
+from constants import ROWS, COLUMNS, BG_COLOR, GAME_LOG
 
 class Connect4App:
     def __init__(self):
@@ -17,17 +20,33 @@ class Connect4App:
         self.menu_screen = MainMenuGUI(self.root, self)
         self.game_screen = GameScreenGUI(self.root, self)
         self.current_screen = None
+        # Opening books by board size, opened once and shared by every game
+        self.books = {}
+
+    def book(self, rows, cols):
+        if (rows, cols) not in self.books:
+            self.books[rows, cols] = open_book(rows, cols)
+        return self.books[rows, cols]
 
     def show_menu(self):
         if self.current_screen:
             self.current_screen.hide()
+        # Trees of the game being left are no longer worth drawing
+        visualizer.cancel()
         self.current_screen = self.menu_screen
         self.menu_screen.show()
 
-    def start_game(self, rows, cols, depth, ai_func):
+    def start_game(self, rows, cols, depth, ai_func, time_budget_ms=None, workers=None,
+                   show_tree=False):
         if self.current_screen:
             self.current_screen.hide()
-        game = Game(rows, cols, depth, ai_func)
+        tracer = None
+        if show_tree:
+            start_visualization()
+            tracer = visualizer.tracer()
+        book = self.book(rows, cols) if ai_func in BOOK_ENGINES else None
+        game = Game(rows, cols, depth, ai_func, time_budget_ms, workers, tracer, book=book,
+                    log=GameLog(GAME_LOG))
         self.game_screen.set_game(game)
         self.current_screen = self.game_screen
         self.game_screen.show()
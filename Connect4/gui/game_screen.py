@@ -1,8 +1,12 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import messagebox
 from gui.base import BaseGUI
 from game import Game
-from constants import ROWS, COLUMNS, AI_PLAYER, HUMAN_PLAYER, BG_COLOR, DARK_BG, BOARD_COLOR, COLORS
+from ai.context import SearchProgress
+from constants import (ROWS, COLUMNS, AI_PLAYER, HUMAN_PLAYER, BG_COLOR, DARK_BG, BOARD_COLOR, COLORS,
+                       AI_POLL_MS, RESIZE_DEBOUNCE_MS)
 
 class GameScreenGUI(BaseGUI):
     def __init__(self, root, navigator):
@@ -13,8 +17,19 @@ class GameScreenGUI(BaseGUI):
         self.status = None
         self.score_label = None
         self.btn_frame = None
+        self.progress_label = None
+        self.move_now_btn = None
+        # (progress, result queue) of the AI search running in a worker thread
+        self.ai_search = None
+        # Canvas size and board shape the items below were laid out for,
+        # the piece oval of each cell and the colour it shows
+        self.drawn_geometry = None
+        self.cell_items = []
+        self.cell_colors = []
+        self.resize_job = None
 
     def set_game(self, game):
+        self._stop_ai()
         self.game = game
 
     def build(self):
@@ -36,7 +51,11 @@ class GameScreenGUI(BaseGUI):
         tk.Label(top_bar, text="CONNECT 4", font=('Arial', 22, 'bold'),
                  bg=DARK_BG, fg='white').pack(side=tk.LEFT, padx=20, pady=10)
 
-        tk.Label(top_bar, text=f"AI Depth: {self.game.depth}",
+        if self.game.time_budget_ms:
+            limit_text = f"AI Time: {self.game.time_budget_ms} ms"
+        else:
+            limit_text = f"AI Depth: {self.game.depth}"
+        tk.Label(top_bar, text=limit_text,
                  font=('Arial', 12), bg=DARK_BG, fg='#AAAAAA').pack(side=tk.LEFT, padx=20)
 
         self.score_label = tk.Label(top_bar, text="AI: 0  |  You: 0",
@@ -51,6 +70,8 @@ class GameScreenGUI(BaseGUI):
     def _build_canvas(self):
         self.canvas = tk.Canvas(self.frame, bg=BOARD_COLOR, highlightthickness=0)
         self.canvas.grid(row=1, column=0, sticky='nsew')
+        self.drawn_geometry = None
+        self.resize_job = None
         self.canvas.bind('<Configure>', self._on_resize)
 
     def _build_column_buttons(self):
@@ -78,7 +99,25 @@ class GameScreenGUI(BaseGUI):
                   bg='#FF9800', fg='white',
                   command=self._restart_game).pack(side=tk.LEFT, padx=20)
 
+        self.move_now_btn = tk.Button(status_frame, text="⏩ Move now", font=('Arial', 12, 'bold'),
+                                      bg='#555555', fg='white', state=tk.DISABLED,
+                                      command=self._move_now)
+        self.move_now_btn.pack(side=tk.LEFT, padx=20)
+
+        self.progress_label = tk.Label(status_frame, text="", font=('Arial', 12),
+                                       bg=BG_COLOR, fg='#AAAAAA')
+        self.progress_label.pack(side=tk.LEFT, padx=20)
+
     def _on_resize(self, event):
+        # A window drag fires many events; lay out once it settles
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+        self.resize_job = self.root.after(RESIZE_DEBOUNCE_MS, self._apply_resize)
+
+    def _apply_resize(self):
+        self.resize_job = None
+        if self.frame is None:
+            return
         self._draw_board()
         self._align_buttons()
 
@@ -98,7 +137,6 @@ class GameScreenGUI(BaseGUI):
             btn.place(x=offset_x + col * cell, width=cell, y=0, height=70)
 
     def _draw_board(self):
-        self.canvas.delete("all")
         cw = self.canvas.winfo_width()
         ch = self.canvas.winfo_height()
         if cw < 10 or ch < 10:
@@ -106,6 +144,22 @@ class GameScreenGUI(BaseGUI):
 
         rows = self.game.board.rows
         cols = self.game.board.cols
+        grid = self.game.board.grid
+        geometry = (cw, ch, rows, cols)
+        if geometry == self.drawn_geometry:
+            # Same layout: only recolour the cells that changed
+            for row in range(rows):
+                for col in range(cols):
+                    color = COLORS[grid[row][col]]
+                    if self.cell_colors[row][col] != color:
+                        self.canvas.itemconfig(self.cell_items[row][col], fill=color)
+                        self.cell_colors[row][col] = color
+            return
+
+        self.canvas.delete("all")
+        self.drawn_geometry = geometry
+        self.cell_items = [[None] * cols for _ in range(rows)]
+        self.cell_colors = [[None] * cols for _ in range(rows)]
         cell = min(cw // cols, ch // rows)
         radius = int(cell * 0.42)
         total_w = cell * cols
@@ -128,19 +182,21 @@ class GameScreenGUI(BaseGUI):
             for col in range(cols):
                 x = ox + col * cell + cell // 2
                 y = oy + row * cell + cell // 2
-                color = COLORS[self.game.board.grid[row][col]]
+                color = COLORS[grid[row][col]]
 
                 self.canvas.create_oval(x - radius + 4, y - radius + 4,
                                        x + radius + 4, y + radius + 4, fill='#004499')
-                self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
-                                       fill=color, outline='#222', width=2)
+                self.cell_items[row][col] = self.canvas.create_oval(
+                    x - radius, y - radius, x + radius, y + radius,
+                    fill=color, outline='#222', width=2)
+                self.cell_colors[row][col] = color
 
     def _update_score(self):
         scores = self.game.get_scores()
         self.score_label.config(text=f"AI: {scores['ai']}  |  You: {scores['human']}")
 
     def _make_move(self, col):
-        if self.game.is_game_over():
+        if self.game.is_game_over() or self.ai_search is not None:
             return
         if not self.game.board.is_valid_column(col):
             return
@@ -148,16 +204,57 @@ class GameScreenGUI(BaseGUI):
         self.game.human_move(col)
         self._draw_board()
         self._update_score()
-        self.root.update()
 
         if self.game.is_game_over():
             self._show_game_over()
             return
 
         self.status.config(text="AI thinking...", fg='#FF4444')
-        self.root.update()
+        self._start_ai()
+
+    def _start_ai(self):
+        # The search runs in a worker thread on a copy of the board, so the
+        # window stays live; _poll_ai picks up the move on the Tk thread
+        progress = SearchProgress()
+        results = queue.Queue()
+        game = self.game
+
+        def search():
+            try:
+                results.put(game.find_ai_move(progress))
+            except Exception as e:
+                results.put(e)
+
+        self.ai_search = (progress, results)
+        self.move_now_btn.config(state=tk.NORMAL)
+        threading.Thread(target=search, daemon=True).start()
+        self.root.after(AI_POLL_MS, self._poll_ai, self.ai_search)
+
+    def _poll_ai(self, search):
+        if search is not self.ai_search or self.frame is None:
+            # Restarted, left or replaced while searching: drop the result
+            search[0].request_stop()
+            return
+        progress, results = search
+        try:
+            col = results.get_nowait()
+        except queue.Empty:
+            reached = (f"Solved {progress.solved} empty cells" if progress.solved is not None
+                       else f"Depth {progress.depth}")
+            self.progress_label.config(
+                text=f"{reached}  |  {progress.nodes:,} nodes  |  "
+                     f"{progress.nodes_per_second():,.0f} nodes/s")
+            self.root.after(AI_POLL_MS, self._poll_ai, search)
+            return
 
-        self.game.ai_move()
+        self.ai_search = None
+        self.move_now_btn.config(state=tk.DISABLED)
+        self.progress_label.config(text="")
+        if isinstance(col, Exception):
+            self.status.config(text=f"AI error: {col}", fg='#FF4444')
+            return
+
+        self.game.play_ai_move(col)
         self._draw_board()
         self._update_score()
 
@@ -166,6 +263,15 @@ class GameScreenGUI(BaseGUI):
         else:
             self.status.config(text="Your turn (Yellow)", fg='#FFDD00')
 
+    def _move_now(self):
+        if self.ai_search is not None:
+            self.ai_search[0].request_stop()
+
+    def _stop_ai(self):
+        if self.ai_search is not None:
+            self.ai_search[0].request_stop()
+            self.ai_search = None
+
     def _show_game_over(self):
         ai_score = self.game.ai_fours
         human_score = self.game.human_fours
@@ -185,6 +291,9 @@ class GameScreenGUI(BaseGUI):
         messagebox.showinfo("Game Over", msg)
 
     def _restart_game(self):
+        self._stop_ai()
+        self.move_now_btn.config(state=tk.DISABLED)
+        self.progress_label.config(text="")
         self.game.reset()
         self.status.config(text="Your turn (Yellow) - Fill the board!", fg='#FFDD00')
         self._update_score()
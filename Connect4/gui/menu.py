@@ -1,12 +1,16 @@
+import os
 import tkinter as tk
 from gui.base import BaseGUI
-from constants import BG_COLOR, ACCENT_COLOR, DEFAULT_DEPTH, MIN_DEPTH, MAX_DEPTH, AI_PLAYER, HUMAN_PLAYER
+from constants import (BG_COLOR, ACCENT_COLOR, DEFAULT_DEPTH, MIN_DEPTH, MAX_DEPTH, AI_PLAYER, HUMAN_PLAYER,
+                       DEFAULT_TIME_MS, MIN_TIME_MS, MAX_TIME_MS)
 from ai.alphabeta import alphabeta_decision
 from ai.minimax import minimax_decision
+from ai.pvs import pvs_decision
 from ai.expected_minimax import expected_minimax_decision
 
 ALGORITHMS = {
     "Alpha-Beta": alphabeta_decision,
+    "PVS": pvs_decision,
     "Minimax": minimax_decision,
     "Expected Minimax": expected_minimax_decision
 }
@@ -18,6 +22,10 @@ class MainMenuGUI(BaseGUI):
         self.cols_var = tk.IntVar(value=7)
         self.depth_var = tk.IntVar(value=DEFAULT_DEPTH)
         self.algorithm_var = tk.StringVar(value="Alpha-Beta")
+        self.limit_var = tk.StringVar(value="depth")
+        self.time_var = tk.IntVar(value=DEFAULT_TIME_MS)
+        self.workers_var = tk.IntVar(value=1)
+        self.show_tree_var = tk.BooleanVar(value=True)
 
     def build(self):
         container = tk.Frame(self.frame, bg=BG_COLOR)
@@ -49,7 +57,13 @@ class MainMenuGUI(BaseGUI):
         depth_frame.pack(pady=10)
         tk.Label(depth_frame, text="AI Depth", font=('Arial', 16, 'bold'),
                  bg=ACCENT_COLOR, fg='white').pack(pady=(0,10))
+        tk.Radiobutton(depth_frame, text="Fixed depth", variable=self.limit_var, value="depth",
+                       bg=ACCENT_COLOR, fg='white', selectcolor=BG_COLOR, font=('Arial', 12)).pack(anchor='w')
         tk.Spinbox(depth_frame, from_=1, to=8, textvariable=self.depth_var, width=5, font=('Arial', 14)).pack()
+        tk.Radiobutton(depth_frame, text="Time per move (ms)", variable=self.limit_var, value="time",
+                       bg=ACCENT_COLOR, fg='white', selectcolor=BG_COLOR, font=('Arial', 12)).pack(anchor='w')
+        tk.Spinbox(depth_frame, from_=MIN_TIME_MS, to=MAX_TIME_MS, increment=100,
+                   textvariable=self.time_var, width=7, font=('Arial', 14)).pack()
 
         # Algorithm
         algo_frame = tk.Frame(container, bg=ACCENT_COLOR, padx=20, pady=20)
@@ -60,6 +74,17 @@ class MainMenuGUI(BaseGUI):
         algo_menu.config(width=15, font=('Arial', 12, 'bold'), bg='white')
         algo_menu.pack()
 
+        # Parallel search
+        workers_frame = tk.Frame(algo_frame, bg=ACCENT_COLOR)
+        workers_frame.pack(pady=(10, 0))
+        tk.Label(workers_frame, text="CPU workers:", bg=ACCENT_COLOR, fg='white', font=('Arial', 12)).pack(side=tk.LEFT, padx=5)
+        tk.Spinbox(workers_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.workers_var, width=5, font=('Arial', 12)).pack(side=tk.LEFT, padx=5)
+
+        # Search tree rendering (serial search only)
+        tk.Checkbutton(algo_frame, text="Show search tree", variable=self.show_tree_var,
+                       bg=ACCENT_COLOR, fg='white', selectcolor=BG_COLOR,
+                       font=('Arial', 12)).pack(pady=(10, 0))
+
         # Start button
         tk.Button(container, text="▶ START GAME", font=('Arial', 24, 'bold'),
                   bg='#4CAF50', fg='white', padx=40, pady=15,
@@ -70,4 +95,7 @@ class MainMenuGUI(BaseGUI):
         cols = self.cols_var.get()
         depth = self.depth_var.get()
         algorithm_name = self.algorithm_var.get()
-        self.navigator.start_game(rows, cols, depth, ALGORITHMS[algorithm_name])
+        time_budget_ms = self.time_var.get() if self.limit_var.get() == "time" else None
+        workers = self.workers_var.get()
+        self.navigator.start_game(rows, cols, depth, ALGORITHMS[algorithm_name], time_budget_ms,
+                                  workers if workers > 1 else None, self.show_tree_var.get())
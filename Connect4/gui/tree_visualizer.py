@@ -1,27 +1,10 @@
-import graphviz
+import subprocess
 import threading
 import time
 from pathlib import Path
 
-
-class TreeNode:
-    def __init__(self, col, score, depth, is_maximizing, alpha, beta):
-        self.col = col
-        self.score = score
-        self.depth = depth
-        self.is_maximizing = is_maximizing
-        self.alpha = alpha
-        self.beta = beta
-        self.children = []
-        self.parent = None
-        self.pruned = False
-        self.id = None  # Unique identifier for graphviz
-        self.is_chance = False  # For expected minimax chance nodes
-        self.probability = None  # For expected minimax probabilities
-    
-    def add_child(self, child):
-        child.parent = self
-        self.children.append(child)
+from ai.tracer import TreeNode, TreeTracer
+from constants import TREE_MAX_PLIES, TREE_MAX_NODES
 
 
 class TreeVisualizer:
@@ -29,11 +12,44 @@ class TreeVisualizer:
         self.root = None
         self.node_counter = 0
         self.output_dir = Path("tree_visualizations")
-        self.output_dir.mkdir(exist_ok=True)
         self.current_file = None
-        self.update_pending = False
         self.render_thread = None
+        # Latest tree waiting for the render thread, and the dot process
+        # rendering the one before it; both guarded by wakeup
+        self.pending = None
+        self.process = None
+        self.wakeup = threading.Condition()
         
+    def show(self, root):
+        """Queue ``root`` (a finished TreeNode tree) for rendering.
+
+        Tracers never touch a tree after handing it over, so the render
+        thread works on it while the next search runs.  A tree still waiting
+        is replaced and a render in progress is cancelled: only the newest
+        search is worth drawing.
+        """
+        with self.wakeup:
+            self.root = root
+            self.pending = root
+            self._kill_render()
+            self.wakeup.notify()
+
+    def cancel(self):
+        """Drop the queued tree and stop the render in progress"""
+        with self.wakeup:
+            self.pending = None
+            self._kill_render()
+
+    def _kill_render(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process = None
+
+    def tracer(self, max_plies=TREE_MAX_PLIES, max_nodes=TREE_MAX_NODES, pv_siblings=None):
+        """A bounded tracer whose finished searches are shown by this visualizer"""
+        return TreeTracer(on_end=self.show, max_plies=max_plies, max_nodes=max_nodes,
+                          pv_siblings=pv_siblings)
+
     def generate_node_id(self):
         """Generate unique node ID"""
         self.node_counter += 1
@@ -46,11 +62,16 @@ class TreeVisualizer:
         for child in node.children:
             self.assign_ids(child)
     
-    def create_graph(self):
+    def create_graph(self, root=None):
         """Create graphviz graph from tree structure"""
-        if self.root is None:
+        if root is None:
+            root = self.root
+        if root is None:
             return None
         
+        # Imported here so the search never pays for graphviz
+        import graphviz
+        
         # Create directed graph
         dot = graphviz.Digraph(comment='Minimax Tree')
         dot.attr(rankdir='TB')  # Top to Bottom
@@ -59,10 +80,10 @@ class TreeVisualizer:
         
         # Assign IDs to nodes
         self.node_counter = 0
-        self.assign_ids(self.root)
+        self.assign_ids(root)
         
         # Add nodes and edges
-        self._add_nodes_and_edges(dot, self.root)
+        self._add_nodes_and_edges(dot, root)
         
         return dot
     
@@ -144,42 +165,71 @@ class TreeVisualizer:
             
             self._add_nodes_and_edges(dot, child)
     
-    def render_tree(self):
+    def render_tree(self, root=None):
         """Render the tree to a file and open it"""
-        if self.root is None:
+        if root is None:
+            root = self.root
+        if root is None:
             return
         
         try:
-            dot = self.create_graph()
+            dot = self.create_graph(root)
             if dot is None:
                 return
             
             # Generate filename with timestamp
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             filename = f"minimax_tree_{timestamp}"
+            self.output_dir.mkdir(exist_ok=True)
             filepath = self.output_dir / filename
             
-            # Render to PNG and PDF
-            dot.render(filepath, format='png', view=True, cleanup=True)
+            # Render to PNG
+            png = str(filepath) + '.png'
+            if not self._run_dot(dot.source, png):
+                return
             
-            self.current_file = str(filepath) + '.png'
+            import graphviz
+            graphviz.view(png)
+            self.current_file = png
             print(f"Tree visualization saved to: {self.current_file}")
             
         except Exception as e:
             print(f"Error rendering tree: {e}")
     
+    def _run_dot(self, source, png):
+        """Run dot on ``source``; False when the render was cancelled"""
+        with self.wakeup:
+            # A newer tree may already be queued behind this one
+            if self.pending is not None:
+                return False
+            process = self.process = subprocess.Popen(
+                ["dot", "-Tpng", "-o", png], stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _, stderr = process.communicate(source.encode())
+        with self.wakeup:
+            # show() and cancel() clear process when they kill it
+            cancelled = self.process is not process
+            self.process = None
+        if cancelled:
+            Path(png).unlink(missing_ok=True)
+            return False
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode(errors='replace').strip())
+        return True
+    
     def update_display(self):
         """Queue an update to render the tree"""
-        self.update_pending = True
+        self.show(self.root)
     
     def start_render_loop(self):
         """Start background thread to render updates"""
         def render_loop():
             while True:
-                if self.update_pending:
-                    self.update_pending = False
-                    self.render_tree()
-                time.sleep(0.5)  # Check every 0.5 seconds
+                with self.wakeup:
+                    while self.pending is None:
+                        self.wakeup.wait()
+                    root, self.pending = self.pending, None
+                self.render_tree(root)
         
         if self.render_thread is None or not self.render_thread.is_alive():
             self.render_thread = threading.Thread(target=render_loop, daemon=True)
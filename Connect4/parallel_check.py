@@ -0,0 +1,72 @@
+"""Check that the parallel search plays the serial search's moves.
+
+    python parallel_check.py --workers 4 --rounds 2
+
+Every engine searches the fixed positions at a few depths, serially with
+a fresh table and then with ``--workers`` processes.  The parallel
+searches run back to back on one pool, ``--rounds`` times over, so a
+worker that kept state from an earlier search shows up as a different
+move.  Mismatches are listed on stderr and the exit status is 1.
+"""
+import argparse
+import sys
+
+from ai.alphabeta import alphabeta_decision
+from ai.expected_minimax import expected_minimax_decision
+from ai.minimax import minimax_decision
+from ai.parallel import default_workers
+from benchmark import make_board
+
+# (rows, cols, moves): column digits, human first
+POSITIONS = [
+    (5, 5, "4"),
+    (6, 7, ""),
+    (6, 7, "3"),
+    (6, 7, "2052260614204325"),
+    (7, 7, "6231201361226146050"),
+]
+
+ENGINES = [
+    ("alphabeta", alphabeta_decision, (2, 4, 6)),
+    ("minimax", minimax_decision, (2, 3)),
+    ("expectimax", expected_minimax_decision, (2, 3)),
+]
+
+
+def check(workers, rounds=2):
+    """Return a description of every parallel move that differs from the
+    serial one."""
+    cases = []
+    for rows, cols, moves in POSITIONS:
+        board = make_board(rows, cols, moves)
+        for name, decision, depths in ENGINES:
+            for depth in depths:
+                serial = decision(board.copy(), depth)
+                cases.append((f"{name}/{rows}x{cols}/{moves or '-'}/d{depth}",
+                              decision, board, depth, serial))
+
+    problems = []
+    for round_ in range(rounds):
+        for key, decision, board, depth, serial in cases:
+            col = decision(board.copy(), depth, workers=workers)
+            if col != serial:
+                problems.append(f"{key} (round {round_ + 1}): serial {serial}, parallel {col}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare parallel and serial search moves.")
+    parser.add_argument("--workers", type=int, default=max(2, default_workers()))
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="passes over the positions on one pool (default: 2)")
+    args = parser.parse_args(argv)
+
+    problems = check(args.workers, args.rounds)
+    for problem in problems:
+        print("MISMATCH", problem, file=sys.stderr)
+    print(f"{len(problems)} mismatches", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
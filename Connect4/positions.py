@@ -0,0 +1,155 @@
+"""Position files: many boards of one size in fixed-size binary records.
+
+    with PositionWriter("mid.pos", 6, 7) as out:
+        out.write(board)
+    for board in iter_positions("mid.pos"):
+        ...
+
+The file is a header (magic, version, rows, cols) followed by one record
+per position: its two bitboards as written by ``Board.bitboards_to_bytes``,
+14 bytes for 6x7.  Records are read in chunks by ``iter_positions``, or
+memory-mapped and indexed by ``PositionFile``, so a file of millions of
+positions never has to fit in memory as Boards.
+"""
+import itertools
+import mmap
+import struct
+
+from board import Board
+from geometry import get_geometry
+
+MAGIC = b"C4PS"
+VERSION = 1
+# magic, version, rows, cols
+HEADER = struct.Struct("<4sHBB")
+
+# Records read per chunk by iter_positions
+CHUNK_RECORDS = 4096
+
+
+def record_size(rows, cols):
+    return 2 * get_geometry(rows, cols).bitboard_bytes
+
+
+def _read_header(data, path):
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a position file")
+    magic, version, rows, cols = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} position file")
+    return rows, cols
+
+
+class PositionWriter:
+    """Appends boards of one size to a new position file."""
+
+    def __init__(self, path, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.count = 0
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, rows, cols))
+
+    def write(self, board):
+        if (board.rows, board.cols) != (self.rows, self.cols):
+            raise ValueError(f"a {board.rows}x{board.cols} board in a "
+                             f"{self.rows}x{self.cols} position file")
+        self.file.write(board.bitboards_to_bytes())
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_positions(path, boards, rows=None, cols=None):
+    """Write ``boards`` to ``path``; the size is taken from the first board
+    unless given.  Returns the number written."""
+    boards = iter(boards)
+    if rows is None or cols is None:
+        first = next(boards, None)
+        if first is None:
+            raise ValueError("no boards to take the size from")
+        rows, cols = first.rows, first.cols
+        boards = itertools.chain((first,), boards)
+    with PositionWriter(path, rows, cols) as out:
+        for board in boards:
+            out.write(board)
+    return out.count
+
+
+def iter_positions(path, chunk=CHUNK_RECORDS):
+    """Yield the boards of a position file in order, reading ``chunk``
+    records at a time."""
+    with open(path, "rb") as f:
+        rows, cols = _read_header(f.read(HEADER.size), path)
+        size = record_size(rows, cols)
+        while True:
+            data = f.read(size * chunk)
+            if len(data) % size:
+                raise ValueError(f"{path} ends in a partial record")
+            for offset in range(0, len(data), size):
+                yield Board.from_bitboard_bytes(rows, cols, data[offset:offset + size])
+            if len(data) < size * chunk:
+                return
+
+
+class PositionFile:
+    """A memory-mapped position file: ``len``, indexing and iteration.
+
+    ``states`` yields ``Board.pack`` tuples without building (or checking)
+    Boards, for handing positions to worker processes.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.rows, self.cols = _read_header(self.data, path)
+        except ValueError:
+            self.data.close()
+            raise
+        self.record_size = record_size(self.rows, self.cols)
+        self.size, partial = divmod(len(self.data) - HEADER.size, self.record_size)
+        if partial:
+            self.data.close()
+            raise ValueError(f"{path} ends in a partial record")
+
+    def __len__(self):
+        return self.size
+
+    def _record(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("position index out of range")
+        start = HEADER.size + self.record_size * index
+        return self.data[start:start + self.record_size]
+
+    def __getitem__(self, index):
+        return Board.from_bitboard_bytes(self.rows, self.cols, self._record(index))
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self[index]
+
+    def states(self):
+        half = self.record_size // 2
+        for index in range(self.size):
+            record = self._record(index)
+            yield (self.rows, self.cols, int.from_bytes(record[:half], 'little'),
+                   int.from_bytes(record[half:], 'little'))
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
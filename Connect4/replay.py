@@ -0,0 +1,147 @@
+"""Replay logged games and search every position again.
+
+    python replay.py game_logs/games.jsonl --engine alphabeta --depth 6 \\
+        --processes 4 --out report.jsonl
+
+Every move of every game in a ``game_log`` log (rotated files included) is
+searched again from the position before it, as the side that played it,
+by ``--engine`` at ``--depth`` (by default the game's own engine and
+depth).  Positions are searched in a process pool, each with a fresh
+transposition table so the results do not depend on the order they run in.
+
+The report has one JSON line per move, in log order: the ``game`` (its
+index in the log), ``ply``, ``player``, the ``played`` column and the
+engine's ``col``, ``score`` (from the mover's side), ``nodes``, ``ms`` and
+``nodes_per_s``, what the game recorded for it (``recorded_source``,
+``recorded_ms``) and the ``position`` as ``Board.to_base64``.  A summary
+with the slowest positions goes to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ai.context import SearchProgress
+from ai.tracer import ScoreTracer
+from ai.transposition import TranspositionTable
+from arena import ENGINES
+from board import Board
+from constants import AI_PLAYER, HUMAN_PLAYER
+from game_log import read_games
+
+# Table size for each replayed search
+REPLAY_TABLE_MB = 16
+# Positions listed in the summary
+DEFAULT_SLOWEST = 10
+# Positions handed to a worker at a time
+CHUNK = 8
+
+# Game records name engines by their decision function
+ENGINE_NAMES = {decision.__name__: name for name, decision in ENGINES.items()}
+
+
+def positions(games, engine=None, depth=None, players=("ai", "human")):
+    """Yield a replay job for every move of ``games`` made by ``players``.
+
+    A job is ``(game, ply, player, played, position, engine, depth,
+    recorded)``, with the position as ``Board.to_bytes`` seen from the
+    mover's side (its pieces are the AI's) so every engine searches it as
+    the maximizing player.
+    """
+    for index, game in enumerate(games):
+        name = engine or ENGINE_NAMES.get(game["engine"])
+        if name is None:
+            raise ValueError(f"game {index}: unknown engine {game['engine']!r}")
+        board = Board(game["rows"], game["cols"])
+        for ply, move in enumerate(game["moves"], 1):
+            player = AI_PLAYER if move["player"] == "ai" else HUMAN_PLAYER
+            if move["player"] in players:
+                mover = board if player == AI_PLAYER else Board.unpack(
+                    (board.rows, board.cols, board.human_bits, board.ai_bits))
+                recorded = {"recorded_source": move.get("source"),
+                            "recorded_ms": move.get("ms")}
+                yield (index, ply, move["player"], move["col"], mover.to_bytes(), name,
+                       depth or game["depth"], recorded)
+            board.drop_piece(move["col"], player)
+
+
+def analyse(job):
+    """Search one replay job; returns its report line."""
+    index, ply, player, played, position, name, depth, recorded = job
+    board = Board.from_bytes(position)
+    progress = SearchProgress()
+    scores = ScoreTracer()
+    start = time.perf_counter()
+    col = ENGINES[name](board.copy(), depth, tt=TranspositionTable(REPLAY_TABLE_MB),
+                        stop=progress, tracer=scores)
+    elapsed = time.perf_counter() - start
+    return dict({
+        "game": index, "ply": ply, "player": player, "played": played, "col": col,
+        "engine": name, "depth": depth, "score": scores.score, "nodes": progress.nodes,
+        "ms": round(elapsed * 1000, 3),
+        "nodes_per_s": round(progress.nodes / elapsed) if elapsed > 0 else None,
+        "position": board.to_base64(),
+    }, **recorded)
+
+
+def replay(jobs, processes=None, on_result=None):
+    """Search every job over a process pool; returns the report lines in
+    job order.  ``on_result(line)`` is called with each as it is ready."""
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for result in pool.map(analyse, jobs, chunksize=CHUNK):
+            if on_result is not None:
+                on_result(result)
+            results.append(result)
+    return results
+
+
+def summary(results, slowest=DEFAULT_SLOWEST):
+    if not results:
+        return "no positions"
+    lines = []
+    total_ms = sum(result["ms"] for result in results)
+    agree = sum(result["col"] == result["played"] for result in results)
+    lines.append(f"{len(results)} positions in {total_ms / 1000:.1f}s of search, "
+                 f"engine agrees with {agree} played moves")
+    for result in sorted(results, key=lambda result: result["ms"], reverse=True)[:slowest]:
+        lines.append(f"  game {result['game']} ply {result['ply']} ({result['player']}): "
+                     f"{result['ms']:.1f} ms, {result['nodes']} nodes, "
+                     f"played {result['played']} best {result['col']}  {result['position']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-search the positions of logged games.")
+    parser.add_argument("log", help="game log written by game_log.GameLog")
+    parser.add_argument("--engine", choices=sorted(ENGINES),
+                        help="engine to search with (default: each game's own)")
+    parser.add_argument("--depth", type=int, help="search depth (default: each game's own)")
+    parser.add_argument("--player", choices=("ai", "human", "both"), default="both",
+                        help="whose moves to replay (default: both)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--slowest", type=int, default=DEFAULT_SLOWEST,
+                        help=f"slowest positions to list (default: {DEFAULT_SLOWEST})")
+    parser.add_argument("--out", help="report file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    players = ("ai", "human") if args.player == "both" else (args.player,)
+    jobs = positions(read_games(args.log), args.engine, args.depth, players)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+
+    def write(result):
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    try:
+        results = replay(jobs, args.processes, write)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(summary(results, args.slowest), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()